@@ -1,6 +1,71 @@
+import copy
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
 import pandas as pd
 from datetime import datetime
 
+from .columnar import build_review_columns, count_reviews_in_window
+
+# Analyst results keyed by (function, hash of the pageProps subtree it reads, extra arguments).
+ANALYSIS_CACHE_SIZE = 1024
+_analysis_cache = OrderedDict()
+_analysis_cache_lock = threading.Lock()
+_MISSING = object()
+
+def _copy_result(result):
+    """Callers annotate returned frames and dicts in place, so cached results are never handed out directly."""
+    if isinstance(result, pd.DataFrame):
+        return result.copy()
+    if isinstance(result, (dict, list)):
+        return copy.deepcopy(result)
+    return result
+
+def memoize_on_subtree(*path):
+    """
+    Memoizes an analyst function by a content hash of the __NEXT_DATA__ subtree at 'path'.
+    A refresh that returns an identical subtree reuses the previous result instead of
+    re-parsing it. If the subtree is missing, the function runs normally.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(data, *args, **kwargs):
+            try:
+                subtree = data
+                for key in path:
+                    subtree = subtree[key]
+                digest = hashlib.blake2b(
+                    json.dumps(subtree, sort_keys=True, separators=(',', ':')).encode('utf-8'),
+                    digest_size=16
+                ).digest()
+            except (KeyError, TypeError, ValueError):
+                return func(data, *args, **kwargs)
+
+            cache_key = (func.__qualname__, digest, args, tuple(sorted(kwargs.items())))
+            with _analysis_cache_lock:
+                cached = _analysis_cache.get(cache_key, _MISSING)
+                if cached is not _MISSING:
+                    _analysis_cache.move_to_end(cache_key)
+            if cached is not _MISSING:
+                return _copy_result(cached)
+
+            result = func(data, *args, **kwargs)
+            with _analysis_cache_lock:
+                _analysis_cache[cache_key] = _copy_result(result)
+                while len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+                    _analysis_cache.popitem(last=False)
+            return result
+        return wrapper
+    return decorator
+
+def clear_analysis_cache():
+    """Drops all memoized analyst results."""
+    with _analysis_cache_lock:
+        _analysis_cache.clear()
+
 def extract_reviews(data):
     """
     Extracts the list of individual reviews from the __NEXT_DATA__ object.
@@ -13,6 +78,15 @@ def extract_reviews(data):
     except (KeyError, TypeError):
         return []
 
+def extract_business_info(data):
+    """Extracts business unit info from the main data object."""
+    if not data:
+        return None
+    try:
+        return data['props']['pageProps']['businessUnit']
+    except (KeyError, TypeError):
+        return None
+
 def calculate_recent_reviews_count(data, days=7):
     """
     Calculates the number of reviews in the last 'days' days.
@@ -23,28 +97,12 @@ def calculate_recent_reviews_count(data, days=7):
         return 0
     
     try:
-        df = pd.DataFrame(reviews)
-        if 'dates' not in df.columns:
-            return 0
-            
-        # Extract publishedDate
-        published_dates = df['dates'].apply(lambda x: x.get('publishedDate') if isinstance(x, dict) else None)
-        published_dates = pd.to_datetime(published_dates, utc=True)
-        
-        published_dates = published_dates.dropna()
-        if published_dates.empty:
-            return 0
-            
-        # Use current time as reference, but handle potential future data in test files
-        now = pd.Timestamp.now(tz='UTC')
-        max_date = published_dates.max()
-        reference_date = max_date if max_date > now else now
-        
-        cutoff = reference_date - pd.Timedelta(days=days)
-        return int(published_dates[published_dates >= cutoff].count())
+        # Reference time is now, or the newest review if it lies in the future (e.g. in test files)
+        return count_reviews_in_window(build_review_columns({'': reviews}), days=days)
     except Exception:
         return 0
 
+@memoize_on_subtree('props', 'pageProps', 'filters', 'reviewStatistics', 'ratings')
 def extract_main_page_star_distribution(data):
     """Extracts the overall star distribution data from the main page."""
     try:
@@ -71,6 +129,7 @@ def extract_main_page_star_distribution(data):
     except (KeyError, TypeError):
         return pd.DataFrame()
 
+@memoize_on_subtree('props', 'pageProps', 'reviewStatistics', 'starsDistribution', 'all')
 def extract_aggregate_star_distribution(data):
     """Extracts the overall star distribution data from the transparency page."""
     try:
@@ -95,6 +154,7 @@ def extract_aggregate_star_distribution(data):
     except (KeyError, TypeError):
         return pd.DataFrame()
 
+@memoize_on_subtree('props', 'pageProps', 'reviewStatistics', 'monthlyDistribution', 'all')
 def extract_reviews_over_time(data):
     """Extracts the data for the 'reviews over time' chart from the transparency page."""
     try:
@@ -120,6 +180,7 @@ def extract_reviews_over_time(data):
     except (KeyError, TypeError):
         return pd.DataFrame()
 
+@memoize_on_subtree('props', 'pageProps', 'reviewStatistics', 'monthlyDistribution')
 def extract_detailed_monthly_distribution(data):
     """
     Extracts detailed monthly distribution by source and rating.
@@ -154,6 +215,7 @@ def extract_detailed_monthly_distribution(data):
     except (KeyError, TypeError):
         return pd.DataFrame()
 
+@memoize_on_subtree('props', 'pageProps', 'reviewStatistics', 'collectingMethodDistribution')
 def extract_source_distribution(data):
     """Extracts the review source distribution data from the transparency page."""
     try:
@@ -170,13 +232,15 @@ def extract_source_distribution(data):
     except (KeyError, TypeError):
         return pd.DataFrame()
 
+@memoize_on_subtree('props', 'pageProps', 'reviewStatistics', 'replyBehavior')
 def analyze_reply_behavior(transparency_data):
     """Extracts reply behavior information from the transparency page data."""
     if not transparency_data:
         return None
     try:
         # Accessing reviewStatistics -> replyBehavior
-        behavior = transparency_data['props']['pageProps']['reviewStatistics']['replyBehavior']
+        # Copy so that adding the label below does not modify the payload (and its memo hash)
+        behavior = dict(transparency_data['props']['pageProps']['reviewStatistics']['replyBehavior'])
         
         avg_days = behavior.get('averageDaysToReply')
         label = "N/A"
@@ -192,4 +256,32 @@ def analyze_reply_behavior(transparency_data):
         behavior['label'] = label
         return behavior
     except (KeyError, TypeError):
-        return None
\ No newline at end of file
+        return None
+
+def _frame_records(df):
+    """Converts a result DataFrame to JSON-ready records, with dates as ISO strings."""
+    if df.empty:
+        return []
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime('%Y-%m-%d')
+    return df.to_dict('records')
+
+def summarize_domain(review_data, transparency_data):
+    """
+    Collects the headline analyst outputs for one domain into a JSON-serializable dict:
+    business info, star distributions, reviews over time, sources and reply behavior.
+    """
+    info = extract_business_info(review_data) or {}
+    return {
+        'displayName': info.get('displayName'),
+        'trustScore': info.get('trustScore'),
+        'numberOfReviews': info.get('numberOfReviews'),
+        'recentReviews7d': calculate_recent_reviews_count(review_data),
+        'starDistribution': _frame_records(extract_main_page_star_distribution(review_data)),
+        'last12MonthsStarDistribution': _frame_records(extract_aggregate_star_distribution(transparency_data)),
+        'reviewsOverTime': _frame_records(extract_reviews_over_time(transparency_data)),
+        'sourceDistribution': _frame_records(extract_source_distribution(transparency_data)),
+        'replyBehavior': analyze_reply_behavior(transparency_data),
+    }
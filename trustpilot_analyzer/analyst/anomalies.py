@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+# Series index 0 is the all-ratings total; 1..5 are the individual star ratings.
+SERIES_LABELS = ['all', '1', '2', '3', '4', '5']
+
+def build_volume_cube(detailed_by_domain):
+    """
+    Stacks per-domain frames from extract_detailed_monthly_distribution
+    ({domain: DataFrame(date, source, rating, count)}) into one array.
+
+    Returns (domains, months, cube) where cube has shape
+    (n_domains, n_months, 6): index 0 of the last axis is the total over all
+    ratings and indexes 1..5 are the star ratings. Sources are summed.
+    """
+    frames = [df.assign(domain=domain) for domain, df in detailed_by_domain.items() if df is not None and not df.empty]
+    if not frames:
+        return [], pd.DatetimeIndex([]), np.zeros((0, 0, len(SERIES_LABELS)))
+
+    combined = pd.concat(frames, ignore_index=True)
+    domain_codes, domains = pd.factorize(combined['domain'], sort=True)
+    month_codes, months = pd.factorize(combined['date'], sort=True)
+    ratings = combined['rating'].to_numpy(dtype=np.int64)
+    counts = combined['count'].to_numpy(dtype=float)
+
+    cube = np.zeros((len(domains), len(months), len(SERIES_LABELS)))
+    np.add.at(cube, (domain_codes, month_codes, ratings), counts)
+    cube[:, :, 0] = cube[:, :, 1:].sum(axis=2)
+    return list(domains), pd.DatetimeIndex(months), cube
+
+def rolling_zscores(cube, window=6, min_periods=3):
+    """
+    Z-score of every month against the mean and standard deviation of the preceding
+    'window' months, computed for all domains and series at once from cumulative sums.
+    The deviation is floored at the Poisson level sqrt(mean) so that very quiet series
+    do not flag single extra reviews. Months with fewer than 'min_periods' prior months are NaN.
+    Returns (zscores, expected), both shaped like the cube.
+    """
+    n_months = cube.shape[1]
+    zeros = np.zeros_like(cube[:, :1, :])
+    cumsum = np.concatenate([zeros, np.cumsum(cube, axis=1)], axis=1)
+    cumsum_sq = np.concatenate([zeros, np.cumsum(cube ** 2, axis=1)], axis=1)
+
+    end = np.arange(n_months)
+    start = np.maximum(end - window, 0)
+    periods = (end - start).astype(float)[None, :, None]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (cumsum[:, end] - cumsum[:, start]) / periods
+        variance = (cumsum_sq[:, end] - cumsum_sq[:, start]) / periods - mean ** 2
+        std = np.sqrt(np.maximum(variance, 0))
+        std = np.maximum(std, np.sqrt(np.maximum(mean, 1.0)))
+        zscores = (cube - mean) / std
+
+    insufficient = (end - start) < min_periods
+    zscores[:, insufficient, :] = np.nan
+    mean[:, insufficient, :] = np.nan
+    return zscores, mean
+
+def changepoint_scores(cube):
+    """
+    Scores a single mean shift at every split month for all domains and series at once:
+    sqrt(t * (n - t) / n) * |mean_before - mean_after| / within-segment deviation
+    (a standardized binary-segmentation statistic). Split t means months [0, t) vs [t, n).
+    The deviation is pooled within the two segments, so the shift itself does not
+    inflate it, and floored at the Poisson level like rolling_zscores.
+    Returns (scores, mean_before, mean_after), each of shape (domains, months, series);
+    split 0 is undefined and set to NaN.
+    """
+    n_months = cube.shape[1]
+    total = cube.sum(axis=1, keepdims=True)
+    total_sq = (cube ** 2).sum(axis=1, keepdims=True)
+    before_sum = np.cumsum(cube, axis=1) - cube
+    before_sq = np.cumsum(cube ** 2, axis=1) - cube ** 2
+    t = np.arange(n_months, dtype=float)[None, :, None]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_before = before_sum / t
+        mean_after = (total - before_sum) / (n_months - t)
+        within_ss = (before_sq - t * mean_before ** 2) + ((total_sq - before_sq) - (n_months - t) * mean_after ** 2)
+        deviation = np.sqrt(np.maximum(within_ss, 0) / n_months)
+        deviation = np.maximum(deviation, np.sqrt(np.maximum(total / n_months, 1.0)))
+        scores = np.sqrt(t * (n_months - t) / n_months) * np.abs(mean_before - mean_after) / deviation
+
+    scores[:, 0, :] = np.nan
+    return scores, mean_before, mean_after
+
+def detect_volume_anomalies(detailed_by_domain, window=6, z_threshold=4.0, changepoint_threshold=4.0, min_count=10):
+    """
+    Flags review-volume spikes (e.g. review bombing or bursts of solicited invitations)
+    and sustained level shifts across all domains in one vectorized pass.
+
+    Returns a DataFrame with columns: domain, month, series ('all' or a star rating),
+    kind ('spike' or 'shift'), count, expected, score. For spikes, 'expected' is the
+    rolling mean and 'score' the z-score. For shifts, 'month' is the first month of the
+    new level, 'count'/'expected' are the mean monthly volume after/before it and
+    'score' is the changepoint statistic. Spikes need at least 'min_count' reviews in the
+    flagged month; shifts need a mean monthly volume of at least 'min_count' on either side,
+    so drops (down to near zero) are reported as well as rises.
+    """
+    domains, months, cube = build_volume_cube(detailed_by_domain)
+    if cube.size == 0:
+        return pd.DataFrame()
+
+    domain_names = np.asarray(domains, dtype=object)
+    series_names = np.asarray(SERIES_LABELS, dtype=object)
+    month_values = months.to_numpy()
+
+    zscores, expected = rolling_zscores(cube, window=window)
+    spike_mask = (zscores >= z_threshold) & (cube >= min_count)
+    d, m, s = np.nonzero(spike_mask)
+    spikes = pd.DataFrame({
+        'domain': domain_names[d],
+        'month': month_values[m],
+        'series': series_names[s],
+        'kind': 'spike',
+        'count': cube[d, m, s],
+        'expected': expected[d, m, s],
+        'score': zscores[d, m, s],
+    })
+
+    scores, mean_before, mean_after = changepoint_scores(cube)
+    best_split = np.argmax(np.nan_to_num(scores, nan=-np.inf), axis=1)  # (domains, series)
+    d, s = np.indices(best_split.shape)
+    d, s, m = d.ravel(), s.ravel(), best_split.ravel()
+    shift_mask = (scores[d, m, s] >= changepoint_threshold) & (np.maximum(mean_before[d, m, s], mean_after[d, m, s]) >= min_count)
+    d, s, m = d[shift_mask], s[shift_mask], m[shift_mask]
+    shifts = pd.DataFrame({
+        'domain': domain_names[d],
+        'month': month_values[m],
+        'series': series_names[s],
+        'kind': 'shift',
+        'count': mean_after[d, m, s],
+        'expected': mean_before[d, m, s],
+        'score': scores[d, m, s],
+    })
+
+    anomalies = pd.concat([spikes, shifts], ignore_index=True)
+    return anomalies.sort_values(['score'], ascending=False).reset_index(drop=True)
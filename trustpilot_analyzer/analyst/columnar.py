@@ -0,0 +1,260 @@
+import numpy as np
+import pandas as pd
+
+# Sentinel for a missing timestamp (the same value pandas uses for NaT)
+NO_TIMESTAMP = np.iinfo(np.int64).min
+# ReviewColumnsBuilder packs buffered reviews into columns once this many are pending,
+# and concatenates the packed chunks once this many have accumulated
+CHUNK_ROWS = 5000
+MAX_PENDING_CHUNKS = 16
+
+def _epoch_seconds(values):
+    """Parses ISO date strings (None allowed) into int64 epoch seconds, NO_TIMESTAMP where missing."""
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), utc=True, errors='coerce', format='ISO8601')
+    # NaT maps to the int64 minimum, which is NO_TIMESTAMP
+    return parsed.dt.tz_localize(None).to_numpy(dtype='datetime64[s]').view(np.int64)
+
+def _encode(values, dtype):
+    """Integer-codes a list of labels. Returns (codes array, list of labels)."""
+    codes, labels = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    return codes.astype(dtype), [str(label) for label in labels]
+
+def _build_arena(strings):
+    """Packs strings into one UTF-8 buffer plus int64 offsets (len(strings) + 1 entries)."""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return b''.join(encoded), offsets
+
+class ReviewColumns:
+    """
+    Compact column-oriented store of individual reviews.
+
+    Domains, sources and languages are integer-coded (with the label lists kept alongside),
+    ratings are int8 and the published, experienced and reply dates are int64 epoch seconds.
+    Review IDs and texts live in separate UTF-8 arenas addressed by offsets, so the numeric
+    columns stay small and contiguous: 33 bytes per review, independent of text length.
+    """
+
+    def __init__(self, domain, domains, source, sources, language, languages, rating,
+                 published, experienced, replied, ids, id_offsets, texts, text_offsets):
+        self.domain = domain
+        self.domains = domains
+        self.source = source
+        self.sources = sources
+        self.language = language
+        self.languages = languages
+        self.rating = rating
+        self.published = published
+        self.experienced = experienced
+        self.replied = replied
+        self.ids = ids
+        self.id_offsets = id_offsets
+        self.texts = texts
+        self.text_offsets = text_offsets
+
+    def __len__(self):
+        return len(self.rating)
+
+    def review_id(self, i):
+        return self.ids[self.id_offsets[i]:self.id_offsets[i + 1]].decode('utf-8')
+
+    def text(self, i):
+        return self.texts[self.text_offsets[i]:self.text_offsets[i + 1]].decode('utf-8')
+
+    def nbytes(self):
+        """Total memory held by the columns and arenas, in bytes."""
+        arrays = (self.domain, self.source, self.language, self.rating, self.published,
+                  self.experienced, self.replied, self.id_offsets, self.text_offsets)
+        return sum(a.nbytes for a in arrays) + len(self.ids) + len(self.texts)
+
+def _review_fields(review):
+    """The fields of one review dict, in ReviewColumnsBuilder's pending-list order."""
+    dates = review.get('dates') or {}
+    reply = review.get('reply') or {}
+    verification = (review.get('labels') or {}).get('verification') or {}
+    return (
+        verification.get('reviewSourceName'),
+        review.get('language'),
+        review.get('rating') or 0,
+        dates.get('publishedDate'),
+        dates.get('experiencedDate'),
+        reply.get('publishedDate') if isinstance(reply, dict) else None,
+        str(review.get('id') or ''),
+        f"{review.get('title') or ''}\n{review.get('text') or ''}",
+    )
+
+def _remap(codes, labels, merged, positions):
+    """Re-codes 'codes' (over 'labels') against the merged label list, keeping the -1 sentinel."""
+    for label in labels:
+        if label not in positions:
+            positions[label] = len(merged)
+            merged.append(label)
+    lookup = np.array([positions[label] for label in labels] + [-1], dtype=codes.dtype)
+    return lookup[codes]
+
+def _concat_arenas(arenas, offsets):
+    starts = np.cumsum([0] + [len(arena) for arena in arenas[:-1]])
+    return b''.join(arenas), np.concatenate([offsets[0][:1]] + [o[1:] + start for o, start in zip(offsets, starts)])
+
+def concat_columns(parts):
+    """
+    Concatenates ReviewColumns into one, merging the domain, source and language label lists
+    (in order of first appearance) and re-coding each part against them.
+    """
+    parts = list(parts)
+    if len(parts) == 1:
+        return parts[0]
+    domains, sources, languages = [], [], []
+    domain_positions, source_positions, language_positions = {}, {}, {}
+    domain_codes, source_codes, language_codes = [], [], []
+    for part in parts:
+        domain_codes.append(_remap(part.domain, part.domains, domains, domain_positions))
+        source_codes.append(_remap(part.source, part.sources, sources, source_positions))
+        language_codes.append(_remap(part.language, part.languages, languages, language_positions))
+
+    ids, id_offsets = _concat_arenas([p.ids for p in parts], [p.id_offsets for p in parts])
+    texts, text_offsets = _concat_arenas([p.texts for p in parts], [p.text_offsets for p in parts])
+    return ReviewColumns(
+        domain=np.concatenate(domain_codes), domains=domains,
+        source=np.concatenate(source_codes), sources=sources,
+        language=np.concatenate(language_codes), languages=languages,
+        rating=np.concatenate([p.rating for p in parts]),
+        published=np.concatenate([p.published for p in parts]),
+        experienced=np.concatenate([p.experienced for p in parts]),
+        replied=np.concatenate([p.replied for p in parts]),
+        ids=ids, id_offsets=id_offsets,
+        texts=texts, text_offsets=text_offsets,
+    )
+
+class ReviewColumnsBuilder:
+    """
+    Packs reviews into ReviewColumns incrementally, e.g. one harvested page at a time.
+
+    Review fields are buffered as Python values for at most 'chunk_rows' reviews and then
+    packed into a chunk of columns; packed chunks are concatenated every
+    MAX_PENDING_CHUNKS chunks. Memory use is therefore the packed size of the reviews so
+    far plus one chunk of buffered fields (twice the packed size while chunks are being
+    concatenated), and callers can drop each page's dicts as soon as it is appended. With unique_ids=True, reviews whose ID was already appended are
+    skipped (the IDs seen are kept in a set for that).
+    """
+
+    def __init__(self, chunk_rows=CHUNK_ROWS, unique_ids=False):
+        self.chunk_rows = chunk_rows
+        self.domains = []
+        self.domain_positions = {}
+        self.seen_ids = set() if unique_ids else None
+        self.chunks = []
+        self.packed_rows = 0
+        self.pending_domains = []
+        self.pending = []
+
+    def __len__(self):
+        return self.packed_rows + len(self.pending)
+
+    def append(self, domain, reviews):
+        """Adds a list of reviews (as returned by extract_reviews) for 'domain'. Returns self."""
+        if domain not in self.domain_positions:
+            self.domain_positions[domain] = len(self.domains)
+            self.domains.append(domain)
+        domain_code = self.domain_positions[domain]
+        for review in reviews or []:
+            if not isinstance(review, dict):
+                continue
+            fields = _review_fields(review)
+            if self.seen_ids is not None:
+                if fields[6] and fields[6] in self.seen_ids:
+                    continue
+                self.seen_ids.add(fields[6])
+            self.pending_domains.append(domain_code)
+            self.pending.append(fields)
+            if len(self.pending) >= self.chunk_rows:
+                self._pack()
+        return self
+
+    def _pack(self):
+        if self.pending:
+            sources, languages, ratings, published, experienced, replied, ids, texts = zip(*self.pending)
+        else:
+            sources = languages = ratings = published = experienced = replied = ids = texts = ()
+        source_codes, source_labels = _encode(list(sources), np.int16)
+        language_codes, language_labels = _encode(list(languages), np.int16)
+        id_arena, id_offsets = _build_arena(ids)
+        text_arena, text_offsets = _build_arena(texts)
+        self.chunks.append(ReviewColumns(
+            domain=np.asarray(self.pending_domains, dtype=np.int32), domains=list(self.domains),
+            source=source_codes, sources=source_labels,
+            language=language_codes, languages=language_labels,
+            rating=np.asarray(ratings, dtype=np.int8),
+            published=_epoch_seconds(list(published)),
+            experienced=_epoch_seconds(list(experienced)),
+            replied=_epoch_seconds(list(replied)),
+            ids=id_arena, id_offsets=id_offsets,
+            texts=text_arena, text_offsets=text_offsets,
+        ))
+        self.packed_rows += len(self.pending)
+        self.pending_domains, self.pending = [], []
+        if len(self.chunks) >= MAX_PENDING_CHUNKS:
+            self.chunks = [concat_columns(self.chunks)]
+
+    def build(self):
+        """Returns the ReviewColumns of everything appended so far (the builder can keep appending)."""
+        if self.pending or not self.chunks:
+            self._pack()
+        self.chunks = [concat_columns(self.chunks)]
+        # The last chunk may predate domains appended without reviews since
+        self.chunks[0].domains = list(self.domains)
+        return self.chunks[0]
+
+def build_review_columns(reviews_by_domain):
+    """
+    Builds ReviewColumns from {domain: [review, ...]} (lists as returned by extract_reviews).
+    The review dicts are read once; nothing is kept that references them. To pack reviews
+    page by page instead, use ReviewColumnsBuilder.
+    """
+    builder = ReviewColumnsBuilder()
+    for domain, reviews in reviews_by_domain.items():
+        builder.append(domain, reviews)
+    return builder.build()
+
+def _domain_mask(columns, domain):
+    if domain is None:
+        return np.ones(len(columns), dtype=bool)
+    if domain not in columns.domains:
+        return np.zeros(len(columns), dtype=bool)
+    return columns.domain == columns.domains.index(domain)
+
+def count_reviews_in_window(columns, days=7, reference=None, domain=None):
+    """
+    Counts reviews published in the 'days' days up to 'reference' (epoch seconds).
+    By default the reference is now, or the newest review if that lies in the future
+    (as in test fixtures), matching calculate_recent_reviews_count.
+    """
+    mask = _domain_mask(columns, domain) & (columns.published != NO_TIMESTAMP)
+    published = columns.published[mask]
+    if published.size == 0:
+        return 0
+    if reference is None:
+        reference = max(int(pd.Timestamp.now(tz='UTC').timestamp()), int(published.max()))
+    return int(np.count_nonzero(published >= reference - days * 86400))
+
+def counts_in_window_by_domain(columns, days=7, reference=None):
+    """Like count_reviews_in_window for every domain at once. Returns an int64 array indexed by domain code."""
+    valid = columns.published != NO_TIMESTAMP
+    if reference is None:
+        newest = int(columns.published[valid].max()) if valid.any() else 0
+        reference = max(int(pd.Timestamp.now(tz='UTC').timestamp()), newest)
+    in_window = valid & (columns.published >= reference - days * 86400)
+    return np.bincount(columns.domain[in_window], minlength=len(columns.domains))
+
+def rating_histogram(columns, domain=None):
+    """Returns review counts for 1..5 stars as an int64 array of length 5."""
+    ratings = columns.rating[_domain_mask(columns, domain)]
+    ratings = ratings[(ratings >= 1) & (ratings <= 5)]
+    return np.bincount(ratings.astype(np.intp) - 1, minlength=5)
+
+def rating_histograms_by_domain(columns):
+    """Returns a (n_domains, 5) int64 array of review counts per domain and star rating."""
+    valid = (columns.rating >= 1) & (columns.rating <= 5)
+    flat = columns.domain[valid].astype(np.int64) * 5 + columns.rating[valid].astype(np.int64) - 1
+    return np.bincount(flat, minlength=len(columns.domains) * 5).reshape(-1, 5)
@@ -0,0 +1,245 @@
+import argparse
+import os
+import shutil
+import sys
+import time
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Add parent directory to path to allow imports from root (ahead of this
+# directory, so that 'analyst' resolves to the package rather than analyst.py)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from analyst.analyst import (
+    extract_aggregate_star_distribution,
+    extract_main_page_star_distribution,
+    extract_reviews_over_time,
+    extract_source_distribution,
+    extract_detailed_monthly_distribution,
+    calculate_recent_reviews_count,
+    analyze_reply_behavior,
+    extract_reviews,
+    extract_business_info
+)
+from analyst.sketches import LatencySketches
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+FILE_EXTENSIONS = {'csv': '.csv', 'jsonl': '.jsonl', 'parquet': '.parquet'}
+CHUNK_ROWS = 10000
+# Small per-domain frames are consolidated once this many are buffered for a table,
+# since thousands of one-row DataFrames cost far more memory than their rows
+MAX_BUFFERED_FRAMES = 64
+
+# Nullable dtypes keep the metrics columns stable across domains (a missing value
+# in the first domain must not turn a number column into a null or object column)
+METRIC_DTYPES = {
+    'displayName': 'string',
+    'trustScore': 'float64',
+    'numberOfReviews': 'Int64',
+    'recentReviews7d': 'Int64',
+    'replyPercentage': 'float64',
+    'averageDaysToReply': 'float64',
+    'replyDaysP50': 'float64',
+    'replyDaysP90': 'float64',
+    'replyDaysP99': 'float64',
+}
+
+class StreamingExporter:
+    """
+    Appends DataFrames to one file per table and format in 'directory'.
+    Rows are buffered per table and written in chunks of at most 'chunk_rows', so memory
+    use is bounded by the chunk size rather than by the size of the export. A table's
+    columns (and, for Parquet, its schema) are fixed by its first chunk.
+    """
+
+    def __init__(self, directory, formats=FORMATS, chunk_rows=CHUNK_ROWS):
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown export formats: {', '.join(sorted(unknown))}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.formats = tuple(formats)
+        self.chunk_rows = chunk_rows
+        self.buffers = {}
+        self.buffered_rows = {}
+        self.columns = {}
+        self.parquet_writers = {}
+
+    def path(self, table, file_format):
+        return os.path.join(self.directory, table + FILE_EXTENSIONS[file_format])
+
+    def write(self, table, df):
+        """Queues the rows of 'df' for 'table', writing a chunk whenever enough rows are buffered."""
+        if df is None or df.empty:
+            return
+        frames = self.buffers.setdefault(table, [])
+        frames.append(df)
+        self.buffered_rows[table] = self.buffered_rows.get(table, 0) + len(df)
+        if self.buffered_rows[table] >= self.chunk_rows:
+            self.flush(table)
+        elif len(frames) >= MAX_BUFFERED_FRAMES:
+            self.buffers[table] = [pd.concat(frames, ignore_index=True)]
+
+    def flush(self, table=None):
+        """Writes out the buffered rows of 'table' (default: all tables)."""
+        for name in [table] if table else list(self.buffers):
+            frames = self.buffers.pop(name, [])
+            self.buffered_rows.pop(name, None)
+            if not frames:
+                continue
+            df = pd.concat(frames, ignore_index=True)
+            for start in range(0, len(df), self.chunk_rows):
+                self._write_chunk(name, df.iloc[start:start + self.chunk_rows])
+
+    def _write_chunk(self, table, df):
+        first = table not in self.columns
+        if first:
+            self.columns[table] = list(df.columns)
+        else:
+            df = df.reindex(columns=self.columns[table])
+
+        if 'csv' in self.formats:
+            df.to_csv(self.path(table, 'csv'), mode='w' if first else 'a', header=first, index=False)
+        if 'jsonl' in self.formats:
+            with open(self.path(table, 'jsonl'), 'w' if first else 'a', encoding='utf-8') as f:
+                df.to_json(f, orient='records', lines=True, date_format='iso')
+        if 'parquet' in self.formats:
+            writer = self.parquet_writers.get(table)
+            if writer is None:
+                arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+                writer = pq.ParquetWriter(self.path(table, 'parquet'), arrow_table.schema)
+                self.parquet_writers[table] = writer
+            else:
+                arrow_table = pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False)
+            writer.write_table(arrow_table)
+
+    def close(self):
+        """Flushes all buffers and finalizes the Parquet files. Returns the written file paths."""
+        self.flush()
+        for writer in self.parquet_writers.values():
+            writer.close()
+        self.parquet_writers = {}
+        return self.files()
+
+    def files(self):
+        return [self.path(table, file_format) for table in self.columns for file_format in self.formats]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _with_domain(df, domain):
+    if df is None or df.empty:
+        return pd.DataFrame()
+    df = df.copy()
+    df.insert(0, 'domain', domain)
+    return df
+
+def domain_tables(domain, review_data, transparency_data):
+    """
+    Computes the exportable results of one domain as {table name: DataFrame}, each with a
+    leading 'domain' column: metrics (one row), star distributions, reviews over time,
+    sources, the detailed monthly distribution and monthly reply-time percentiles.
+    """
+    info = extract_business_info(review_data) or {}
+    reply_stats = analyze_reply_behavior(transparency_data) or {}
+    sketches = LatencySketches().add_reviews(domain, extract_reviews(review_data))
+    timings = sketches.summary()
+    reply_days = timings[timings['metric'] == 'reply_days'].to_dict('records') if not timings.empty else []
+    reply_days = reply_days[0] if reply_days else {}
+
+    metrics = pd.DataFrame([{
+        'domain': domain,
+        'displayName': info.get('displayName'),
+        'trustScore': info.get('trustScore'),
+        'numberOfReviews': info.get('numberOfReviews'),
+        'recentReviews7d': calculate_recent_reviews_count(review_data),
+        'replyPercentage': reply_stats.get('replyPercentage'),
+        'averageDaysToReply': reply_stats.get('averageDaysToReply'),
+        'replyDaysP50': reply_days.get('p50'),
+        'replyDaysP90': reply_days.get('p90'),
+        'replyDaysP99': reply_days.get('p99'),
+    }]).astype(METRIC_DTYPES)
+
+    return {
+        'metrics': metrics,
+        'star_distribution': _with_domain(extract_main_page_star_distribution(review_data), domain),
+        'last_12_months_star_distribution': _with_domain(extract_aggregate_star_distribution(transparency_data), domain),
+        'reviews_over_time': _with_domain(extract_reviews_over_time(transparency_data), domain),
+        'source_distribution': _with_domain(extract_source_distribution(transparency_data), domain),
+        'detailed_monthly_distribution': _with_domain(extract_detailed_monthly_distribution(transparency_data), domain),
+        'review_timings': sketches.summary(by_month=True),
+    }
+
+def export_domains(domains, load, directory, formats=FORMATS, chunk_rows=CHUNK_ROWS, progress=None):
+    """
+    Exports the results of 'domains' to 'directory', one domain at a time: 'load(domain)'
+    returns (review_data, transparency_data) (or Nones to skip the domain), the domain's tables
+    are written, and nothing of it is kept. 'progress(done, total, domain)' is called after
+    each domain. Returns the list of written file paths.
+    """
+    with StreamingExporter(directory, formats=formats, chunk_rows=chunk_rows) as exporter:
+        for i, domain in enumerate(domains):
+            review_data, transparency_data = load(domain)
+            if review_data and transparency_data:
+                for table, df in domain_tables(domain, review_data, transparency_data).items():
+                    exporter.write(table, df)
+            if progress:
+                progress(i + 1, len(domains), domain)
+    return exporter.files()
+
+def zip_export(files, zip_path):
+    """Packs exported files into one zip for downloading. Parquet files are stored as-is (already compressed)."""
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        for path in files:
+            if os.path.exists(path):
+                compression = zipfile.ZIP_STORED if path.endswith('.parquet') else zipfile.ZIP_DEFLATED
+                archive.write(path, os.path.basename(path), compress_type=compression)
+    return zip_path
+
+def remove_stale_exports(directory, prefix, max_age, now=None):
+    """
+    Deletes the export directories in 'directory' whose name starts with 'prefix' and that were
+    last modified more than 'max_age' seconds ago. Returns the number of directories removed.
+    """
+    now = now or time.time()
+    removed = 0
+    if not os.path.isdir(directory):
+        return removed
+    for entry in os.scandir(directory):
+        try:
+            stale = entry.is_dir() and entry.name.startswith(prefix) and now - entry.stat().st_mtime > max_age
+        except FileNotFoundError:
+            continue  # Removed concurrently by another session
+        if stale:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+if __name__ == '__main__':
+    from store.snapshots import open_snapshot_store, load_snapshot, snapshot_ages
+    from config import SNAPSHOT_STORE_PATH, EXPORT_DIR
+
+    parser = argparse.ArgumentParser(description="Export stored domain snapshots as CSV, JSON Lines and/or Parquet.")
+    parser.add_argument('--domain', action='append', default=[], help="Domain to export (repeatable; default: all stored)")
+    parser.add_argument('--format', action='append', choices=FORMATS, help="Output format (repeatable; default: all)")
+    parser.add_argument('--out', default=os.path.join(EXPORT_DIR, time.strftime('export-%Y%m%d-%H%M%S')))
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    store = open_snapshot_store(SNAPSHOT_STORE_PATH)
+
+    def load_stored(domain):
+        snapshot = load_snapshot(store, domain)
+        return (snapshot['review_data'], snapshot['transparency_data']) if snapshot else (None, None)
+
+    start = time.perf_counter()
+    domains = args.domain or sorted(snapshot_ages(store))
+    files = export_domains(domains, load_stored, args.out, formats=args.format or FORMATS, chunk_rows=args.chunk_rows)
+    print(f"Exported {len(domains)} domains to {len(files)} files in {args.out} ({time.perf_counter() - start:.1f}s).")
+    store.close()
@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+# Add parent directory to path to allow imports from root (ahead of this
+# directory, so that 'analyst' resolves to the package rather than analyst.py)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from analyst.analyst import (
+    extract_aggregate_star_distribution,
+    extract_main_page_star_distribution,
+    extract_reviews_over_time,
+    extract_source_distribution,
+    extract_detailed_monthly_distribution,
+    calculate_recent_reviews_count,
+    analyze_reply_behavior,
+    extract_reviews
+)
+from store.archive import read_archive_index, read_payloads
+
+REVIEW_PAGE_ANALYSTS = {
+    'main_page_star_distribution': extract_main_page_star_distribution,
+    'recent_reviews_count': calculate_recent_reviews_count,
+}
+
+TRANSPARENCY_PAGE_ANALYSTS = {
+    'aggregate_star_distribution': extract_aggregate_star_distribution,
+    'reviews_over_time': extract_reviews_over_time,
+    'detailed_monthly_distribution': extract_detailed_monthly_distribution,
+    'source_distribution': extract_source_distribution,
+    'reply_behavior': analyze_reply_behavior,
+}
+
+def analysts_for_url(url):
+    """Picks the analyst functions that apply to a review page or a transparency page."""
+    if url.split('?')[0].rstrip('/').endswith('/transparency'):
+        return TRANSPARENCY_PAGE_ANALYSTS
+    return REVIEW_PAGE_ANALYSTS
+
+def _replay_chunk(archive_dir, records):
+    """Worker: decompresses one chunk of index records and runs the analysts on each payload."""
+    results = []
+    spans = [(offset, length) for offset, length, _, _ in records]
+    for (_, _, fetched_at, url), raw_json in zip(records, read_payloads(archive_dir, spans)):
+        try:
+            data = json.loads(raw_json)
+        except json.JSONDecodeError:
+            continue
+        results.append({
+            'url': url,
+            'fetched_at': fetched_at,
+            'results': {name: analyst(data) for name, analyst in analysts_for_url(url).items()},
+        })
+    return results
+
+def replay_archive(archive_dir, url_filter=None, since=None, workers=None, chunk_size=64):
+    """
+    Feeds archived payloads through the analyst functions in parallel processes, with no network access.
+    Optionally restrict to URLs containing 'url_filter' and to payloads fetched at or after 'since'.
+    Yields one dict per payload, in archive order: {'url', 'fetched_at', 'results': {analyst name: result}}.
+    """
+    index = read_archive_index(archive_dir)
+    if url_filter:
+        index = index[index['url'].str.contains(url_filter, regex=False)]
+    if since is not None:
+        since = pd.Timestamp(since)
+        index = index[index['fetched_at'] >= (since if since.tzinfo else since.tz_localize('UTC'))]
+    if index.empty:
+        return
+
+    records = list(index[['offset', 'length', 'fetched_at', 'url']].itertuples(index=False, name=None))
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_results in executor.map(_replay_chunk, [archive_dir] * len(chunks), chunks):
+            yield from chunk_results
+
+def archived_reviews(archive_dir, domain_filter=None):
+    """
+    Collects {domain: reviews} from every archived review page (not transparency pages).
+    All captures are read in archive order, so repeated fetches of the same URL add the
+    history they held at the time; a review seen more than once keeps its latest copy.
+    Optionally restrict to domains containing 'domain_filter'.
+    """
+    index = read_archive_index(archive_dir)
+    paths = index['url'].map(lambda url: urlsplit(url).path.rstrip('/'))
+    index = index.assign(path=paths)
+    index = index[index['path'].str.startswith('/review/') & ~index['path'].str.endswith('/transparency')]
+    index = index.assign(domain=index['path'].str.removeprefix('/review/'))
+    if domain_filter:
+        index = index[index['domain'].str.contains(domain_filter, regex=False)]
+
+    reviews_by_domain = {}
+    spans = zip(index['offset'], index['length'])
+    for domain, raw_json in zip(index['domain'], read_payloads(archive_dir, spans)):
+        try:
+            page = json.loads(raw_json)
+        except json.JSONDecodeError:
+            continue
+        reviews = reviews_by_domain.setdefault(domain, {})
+        for review in extract_reviews(page):
+            reviews[review.get('id') or id(review)] = review
+    return {domain: list(reviews.values()) for domain, reviews in reviews_by_domain.items()}
+
+if __name__ == '__main__':
+    from config import ARCHIVE_DIR
+
+    parser = argparse.ArgumentParser(description="Re-run the analysts over archived __NEXT_DATA__ payloads.")
+    parser.add_argument('--archive', default=ARCHIVE_DIR, help="Archive directory (default: %(default)s)")
+    parser.add_argument('--domain', help="Only replay payloads whose URL contains this string")
+    parser.add_argument('--since', help="Only replay payloads fetched at or after this date")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = 0
+    for item in replay_archive(args.archive, url_filter=args.domain, since=args.since, workers=args.workers):
+        count += 1
+        summary = ', '.join(
+            f"{name}={len(result) if hasattr(result, '__len__') else result}"
+            for name, result in item['results'].items()
+        )
+        print(f"{item['fetched_at']:%Y-%m-%d %H:%M} {item['url']}: {summary}")
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {count} payloads in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f}/s).")
@@ -0,0 +1,203 @@
+import numpy as np
+import pandas as pd
+
+from .columnar import NO_TIMESTAMP, build_review_columns
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+SECONDS_PER_DAY = 86400.0
+
+class TDigest:
+    """
+    Mergeable t-digest quantile sketch (merging variant with the arcsine scale function).
+
+    Values are buffered and folded into at most ~'compression' weighted centroids, which
+    are kept small near the tails, so extreme quantiles such as p99 stay accurate while
+    memory stays bounded no matter how many values are added. Two digests merge by
+    folding one's centroids into the other.
+    """
+
+    def __init__(self, compression=100, buffer_size=None):
+        self.compression = compression
+        self.buffer_size = buffer_size or 10 * compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self._buffer = []
+        self._buffered = 0
+
+    def __len__(self):
+        return int(self.count)
+
+    def add_many(self, values, weights=None):
+        """Adds an array of values (NaNs are ignored), optionally with per-value weights."""
+        values = np.asarray(values, dtype=float).ravel()
+        weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=float).ravel()
+        keep = ~np.isnan(values)
+        values, weights = values[keep], weights[keep]
+        if values.size == 0:
+            return self
+        self._buffer.append((values, weights))
+        self._buffered += values.size
+        self.count += weights.sum()
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        if self._buffered >= self.buffer_size:
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """Folds another digest into this one. Returns self."""
+        other._compress()
+        if other.count:
+            self._buffer.append((other.means, other.weights))
+            self._buffered += other.means.size
+            self.count += other.count
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress()
+        return self
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        means = np.concatenate([self.means] + [values for values, _ in self._buffer])
+        weights = np.concatenate([self.weights] + [w for _, w in self._buffer])
+        self._buffer, self._buffered = [], 0
+
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        total = cumulative[-1]
+
+        # Points whose mid-quantile falls into the same unit interval of k(q) = d/pi * asin(2q - 1)
+        # share a centroid; k is steep near q = 0 and q = 1, so tail centroids stay small.
+        q = (cumulative - weights / 2) / total
+        k = np.floor(self.compression / np.pi * np.arcsin(np.clip(2 * q - 1, -1.0, 1.0)))
+        starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+
+    def quantile(self, q):
+        """Estimated value at quantile(s) 'q' in [0, 1]. NaN for an empty digest."""
+        self._compress()
+        q = np.asarray(q, dtype=float)
+        if not self.count:
+            return np.full(q.shape, np.nan) if q.ndim else np.nan
+        # Each centroid sits at the midpoint of its weight; min and max anchor both ends
+        positions = np.r_[0.0, np.cumsum(self.weights) - self.weights / 2, self.count]
+        values = np.r_[self.min, self.means, self.max]
+        return np.interp(q * self.count, positions, values)
+
+    def centroids(self):
+        """Returns (means, weights) of the compressed centroids."""
+        self._compress()
+        return self.means.copy(), self.weights.copy()
+
+class LatencySketches:
+    """
+    Per-domain, per-month t-digests of two review timings, in days:
+
+    - 'reply_days': from a review's publication to the company's reply
+    - 'review_delay_days': from the customer's experience to the review's publication
+
+    Reviews are added page by page and only the digests are kept, so whole review
+    histories can be summarized without holding them in memory. Months follow the
+    review's publication date. Collectors (e.g. from several workers) can be merged.
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.digests = {}
+
+    def add_reviews(self, domain, reviews):
+        """Adds a list of reviews (as returned by extract_reviews) for 'domain'. Returns self."""
+        return self.add_columns(build_review_columns({domain: reviews}))
+
+    def add_columns(self, columns):
+        """Adds every review of a ReviewColumns store. Returns self."""
+        published = columns.published
+        has_published = published != NO_TIMESTAMP
+        months = published.astype('datetime64[s]').astype('datetime64[M]')
+
+        timings = {
+            'reply_days': (columns.replied, published, has_published & (columns.replied != NO_TIMESTAMP)),
+            'review_delay_days': (published, columns.experienced, has_published & (columns.experienced != NO_TIMESTAMP)),
+        }
+        for metric, (end, start, valid) in timings.items():
+            if not valid.any():
+                continue
+            # Clock skew can put a reply a few seconds before its review; treat that as zero
+            days = np.maximum(end[valid] - start[valid], 0) / SECONDS_PER_DAY
+            keys = pd.DataFrame({'domain': columns.domain[valid], 'month': months[valid]})
+            for (domain_code, month), rows in keys.groupby(['domain', 'month'], sort=False).indices.items():
+                key = (metric, columns.domains[domain_code], pd.Timestamp(month))
+                if key not in self.digests:
+                    self.digests[key] = TDigest(self.compression)
+                self.digests[key].add_many(days[rows])
+        return self
+
+    def merge(self, other):
+        """Folds another collector's digests into this one. Returns self."""
+        for key, digest in other.digests.items():
+            if key not in self.digests:
+                self.digests[key] = TDigest(self.compression)
+            self.digests[key].merge(digest)
+        return self
+
+    def domains(self):
+        return sorted({domain for _, domain, _ in self.digests})
+
+    def _merged(self, group_key, domains=None):
+        """Merges the monthly digests into {(metric, group...): TDigest}."""
+        merged = {}
+        for key, digest in self.digests.items():
+            if domains is not None and key[1] not in domains:
+                continue
+            target = group_key(key)
+            if target not in merged:
+                merged[target] = TDigest(self.compression)
+            merged[target].merge(digest)
+        return merged
+
+    def _frame(self, merged, columns, quantiles):
+        rows = []
+        for key, digest in sorted(merged.items()):
+            row = dict(zip(columns, key))
+            row['count'] = len(digest)
+            row.update(zip((f"p{round(q * 100):d}" for q in quantiles), digest.quantile(quantiles)))
+            rows.append(row)
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame(rows)
+
+    def summary(self, by_month=False, domains=None, quantiles=DEFAULT_QUANTILES):
+        """
+        Returns a DataFrame with one row per metric and domain (and month, if 'by_month'):
+        metric, domain, [month], count, p50, p90, p99 (in days).
+        """
+        if by_month:
+            return self._frame(self._merged(lambda key: key, domains), ['metric', 'domain', 'month'], quantiles)
+        return self._frame(self._merged(lambda key: key[:2], domains), ['metric', 'domain'], quantiles)
+
+    def portfolio(self, domains=None, by_month=False, quantiles=DEFAULT_QUANTILES):
+        """
+        Like summary, but with the given domains (default: all) merged into one distribution:
+        metric, [month], count, p50, p90, p99.
+        """
+        if by_month:
+            return self._frame(self._merged(lambda key: (key[0], key[2]), domains), ['metric', 'month'], quantiles)
+        return self._frame(self._merged(lambda key: key[:1], domains), ['metric'], quantiles)
+
+def latency_summary(reviews, domain='', quantiles=DEFAULT_QUANTILES):
+    """
+    Convenience wrapper for a single list of reviews.
+    Returns {metric: {'count', 'p50', 'p90', 'p99'}}, empty if no timings are available.
+    """
+    df = LatencySketches().add_reviews(domain, reviews).summary(quantiles=quantiles)
+    if df.empty:
+        return {}
+    return {row.pop('metric'): row for row in df.drop(columns='domain').to_dict('records')}
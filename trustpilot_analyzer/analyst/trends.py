@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from scipy import sparse
+
+from .analyst import extract_reviews
+from .columnar import build_review_columns
+
+# Tokens are lower-cased runs of letters (including accented ones) of length >= 3:
+# texts are split on anything that is not a letter and shorter pieces are dropped.
+TOKEN_SEPARATOR = r"[^\pL]+"
+MIN_TOKEN_LENGTH = 3
+N_FEATURES = 2 ** 18
+# Terms whose smoothed log2 frequency ratio is closer to zero than this are not trends
+MIN_SCORE = 0.5
+
+STOP_WORDS = {
+    'the', 'and', 'for', 'was', 'with', 'that', 'this', 'have', 'they', 'you', 'are', 'but',
+    'not', 'very', 'were', 'had', 'has', 'from', 'all', 'our', 'out', 'one', 'would', 'will',
+    'get', 'got', 'them', 'their', 'there', 'been', 'which', 'when', 'what', 'your', 'just',
+    'der', 'die', 'das', 'und', 'ist', 'nicht', 'ich', 'mit', 'sie', 'den', 'sehr', 'auf',
+    'ein', 'eine', 'war', 'wir', 'auch', 'hat', 'habe', 'von', 'för', 'och', 'det', 'het', 'een',
+}
+
+def reviews_to_frame(reviews_by_domain):
+    """
+    Flattens {domain: [review, ...]} (lists as returned by extract_reviews) into a
+    DataFrame with columns: domain, month, rating, text.
+    'month' uses the same first-of-month buckets as the Lookback section. The texts
+    stay in one Arrow string array (title and text joined by a newline).
+    """
+    columns = build_review_columns(reviews_by_domain)
+    texts = pa.LargeStringArray.from_buffers(
+        len(columns), pa.py_buffer(columns.text_offsets), pa.py_buffer(columns.texts)
+    )
+    # NO_TIMESTAMP is the int64 minimum, which datetime64 reads as NaT
+    months = columns.published.astype('datetime64[s]').astype('datetime64[M]').astype('datetime64[ns]')
+    df = pd.DataFrame({
+        'domain': pd.Categorical.from_codes(columns.domain, categories=columns.domains) if columns.domains else [],
+        'month': months,
+        'rating': columns.rating.astype(int),
+        'text': pd.arrays.ArrowExtensionArray(texts),
+    })
+    df = df[df['month'].notna() & df['rating'].between(1, 5)]
+    df['domain'] = df['domain'].astype(str)
+    return df.reset_index(drop=True)
+
+def reviews_from_payloads(payloads_by_domain):
+    """Builds {domain: reviews} from {domain: [__NEXT_DATA__ page, ...]} via extract_reviews."""
+    return {
+        domain: [review for page in pages for review in extract_reviews(page)]
+        for domain, pages in payloads_by_domain.items()
+    }
+
+def build_term_matrix(review_df, n_features=N_FEATURES):
+    """
+    Tokenizes review texts into hashed term counts per (domain, month, rating) bucket.
+
+    Returns (matrix, buckets, vocabulary):
+    - matrix: scipy CSR matrix of shape (n_buckets, n_features) with term counts
+    - buckets: DataFrame (domain, month, rating, reviews) describing each matrix row
+    - vocabulary: Series mapping feature index -> most frequent token hashed to it
+    """
+    if review_df.empty:
+        empty_buckets = pd.DataFrame(columns=['domain', 'month', 'rating', 'reviews'])
+        return sparse.csr_matrix((0, n_features)), empty_buckets, pd.Series(dtype=object)
+
+    review_df = review_df.reset_index(drop=True)
+    grouped = review_df.groupby(['domain', 'month', 'rating'], sort=True)
+    bucket_ids = grouped.ngroup().to_numpy()
+    buckets = grouped.size().rename('reviews').reset_index()
+
+    # Tokenize in Arrow kernels: no Python objects per review or per token
+    texts = pa.array(review_df['text'], type=pa.large_string())
+    pieces = pc.split_pattern_regex(pc.utf8_lower(texts), TOKEN_SEPARATOR)
+    tokens = pc.list_flatten(pieces)
+    long_enough = pc.greater_equal(pc.utf8_length(tokens), MIN_TOKEN_LENGTH)
+    token_rows = bucket_ids[pc.filter(pc.list_parent_indices(pieces), long_enough).to_numpy()]
+
+    # Hash each distinct token once and map the (much longer) token stream through the codes.
+    encoded = pc.dictionary_encode(pc.filter(tokens, long_enough))
+    codes = encoded.indices.to_numpy()
+    uniques = np.asarray(encoded.dictionary.to_pylist(), dtype=object)
+    unique_features = (pd.util.hash_array(uniques) % np.uint64(n_features)).astype(np.int64)
+    unique_features[np.isin(uniques, list(STOP_WORDS))] = -1
+    features = unique_features[codes]
+    keep = features >= 0
+
+    matrix = sparse.coo_matrix(
+        (np.ones(keep.sum(), dtype=np.int32), (token_rows[keep], features[keep])),
+        shape=(len(buckets), n_features),
+    ).tocsr()
+
+    token_counts = np.bincount(codes, minlength=len(uniques))
+    vocabulary = (
+        pd.DataFrame({'feature': unique_features, 'token': uniques, 'count': token_counts})
+        .query('feature >= 0')
+        .sort_values('count', ascending=False)
+        .drop_duplicates('feature')
+        .set_index('feature')['token']
+    )
+    return matrix, buckets, vocabulary
+
+def compute_term_trends(matrix, buckets, vocabulary, recent_months=3, ratings=None, min_count=3, top_n=15,
+                        min_score=MIN_SCORE):
+    """
+    Compares term frequencies in each domain's last 'recent_months' months against
+    its earlier months and returns the strongest rising and falling terms.
+
+    Frequencies are normalized by the number of reviews in each window and compared as a
+    smoothed log ratio, so a domain that simply gets more reviews does not make every
+    term "rise". Terms whose |score| is below 'min_score' (log2 ratio; 0.5 is about a 1.4x
+    change) count as unchanged. Optionally restrict to a list of star 'ratings'.
+
+    Returns a DataFrame with columns: domain, term, recent_count, prior_count,
+    recent_rate, prior_rate, score, direction ('rising' / 'falling').
+    """
+    if matrix.shape[0] == 0:
+        return pd.DataFrame()
+
+    rows = buckets.copy()
+    rows['row'] = np.arange(len(rows))
+    if ratings:
+        rows = rows[rows['rating'].isin(ratings)]
+
+    results = []
+    for domain, domain_rows in rows.groupby('domain'):
+        months = np.sort(domain_rows['month'].unique())
+        if len(months) <= recent_months:
+            continue
+        is_recent = domain_rows['month'].isin(months[-recent_months:]).to_numpy()
+
+        recent_idx = domain_rows['row'].to_numpy()[is_recent]
+        prior_idx = domain_rows['row'].to_numpy()[~is_recent]
+        recent_counts = np.asarray(matrix[recent_idx].sum(axis=0)).ravel()
+        prior_counts = np.asarray(matrix[prior_idx].sum(axis=0)).ravel()
+        recent_reviews = domain_rows['reviews'].to_numpy()[is_recent].sum()
+        prior_reviews = domain_rows['reviews'].to_numpy()[~is_recent].sum()
+
+        candidates = np.flatnonzero((recent_counts + prior_counts) >= min_count)
+        if candidates.size == 0:
+            continue
+        recent_rate = (recent_counts[candidates] + 0.5) / (recent_reviews + 1)
+        prior_rate = (prior_counts[candidates] + 0.5) / (prior_reviews + 1)
+        score = np.log2(recent_rate / prior_rate)
+
+        order = np.argsort(score)
+        for direction, picks in (('rising', order[::-1][:top_n]), ('falling', order[:top_n])):
+            picks = picks[score[picks] >= min_score] if direction == 'rising' else picks[score[picks] <= -min_score]
+            features = candidates[picks]
+            results.append(pd.DataFrame({
+                'domain': domain,
+                'term': vocabulary.reindex(features).to_numpy(),
+                'recent_count': recent_counts[features],
+                'prior_count': prior_counts[features],
+                'recent_rate': recent_rate[picks],
+                'prior_rate': prior_rate[picks],
+                'score': score[picks],
+                'direction': direction,
+            }))
+
+    if not results:
+        return pd.DataFrame()
+    return pd.concat(results, ignore_index=True)
+
+def term_trends(reviews_by_domain, recent_months=3, ratings=None, top_n=15, min_score=MIN_SCORE):
+    """Convenience wrapper: {domain: reviews} -> rising/falling terms per domain."""
+    review_df = reviews_to_frame(reviews_by_domain)
+    matrix, buckets, vocabulary = build_term_matrix(review_df)
+    return compute_term_trends(matrix, buckets, vocabulary, recent_months=recent_months, ratings=ratings,
+                               top_n=top_n, min_score=min_score)
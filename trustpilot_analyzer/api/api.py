@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+# Add parent directory to path to allow imports from root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from harvester.harvester import fetch_next_data
+from harvester.egress import build_egress_pool
+from analyst.analyst import summarize_domain
+from store.snapshots import open_snapshot_store, save_snapshot, load_summary
+from config import SNAPSHOT_STORE_PATH, ARCHIVE_DIR, EGRESS_ROUTES, INTERACTIVE_MAX_WAIT_SECONDS
+
+# Summaries younger than this are served as-is; older ones are served while a refresh runs
+FRESH_SECONDS = 15 * 60
+# Summaries older than this are not served stale; the request waits for a refresh instead
+MAX_STALE_SECONDS = 24 * 60 * 60
+# Domains that could not be fetched (e.g. unknown or misspelled) are not retried for this long
+FAILURE_SECONDS = 10 * 60
+MAX_BATCH_DOMAINS = 200
+# Summaries and failures are kept for at most this many domains each (least recently used go first)
+MAX_CACHED_DOMAINS = 10000
+# A hostname, optionally followed by a path of simple segments (e.g. 'deichmann.com/dk/da/shop')
+DOMAIN_PATTERN = re.compile(r"(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}(?:/[a-z0-9_-]+)*", re.IGNORECASE)
+
+def is_valid_domain(domain):
+    """Whether 'domain' looks like a Trustpilot review domain, so it is safe to put into a review URL."""
+    return len(domain) <= 253 and DOMAIN_PATTERN.fullmatch(domain) is not None
+
+class SummaryCache:
+    """
+    In-memory cache of serialized per-domain summaries in front of the snapshot store.
+    Hits return pre-encoded JSON bytes, so the hot path never touches the analysts,
+    the database or the JSON encoder. Stale entries are first re-read from the store
+    (which the refresher keeps warm) and otherwise refreshed in the background;
+    concurrent misses for the same domain share one refresh. Failed refreshes are
+    remembered for 'failure_seconds', so unknown domains do not cost a scrape per request.
+    Both are kept for at most 'max_domains' domains.
+    """
+
+    def __init__(self, store_path, archive_dir=None, route_specs=None,
+                 fresh_seconds=FRESH_SECONDS, max_stale_seconds=MAX_STALE_SECONDS, failure_seconds=FAILURE_SECONDS,
+                 max_domains=MAX_CACHED_DOMAINS):
+        self.store = open_snapshot_store(store_path)
+        # A single thread owns the SQLite connection; fetches get their own pool
+        self.store_executor = ThreadPoolExecutor(max_workers=1)
+        self.fetch_executor = ThreadPoolExecutor(max_workers=8)
+        self.egress_pool = build_egress_pool(route_specs, max_wait=INTERACTIVE_MAX_WAIT_SECONDS) if route_specs else None
+        self.archive_dir = archive_dir
+        self.fresh_seconds = fresh_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.failure_seconds = failure_seconds
+        self.max_domains = max_domains
+        self.entries = OrderedDict()
+        self.failed_until = OrderedDict()
+        self.refreshing = {}
+
+    async def get(self, domain):
+        """Returns (body_bytes, etag, fetched_at) for 'domain', or None if it cannot be fetched."""
+        loop = asyncio.get_running_loop()
+        entry = self.entries.get(domain)
+        if entry is not None:
+            self.entries.move_to_end(domain)
+        if entry is None or time.time() - entry[2] > self.fresh_seconds:
+            # The refresher may have stored a newer snapshot than the one held in memory
+            row = await loop.run_in_executor(self.store_executor, load_summary, self.store, domain)
+            if row and (entry is None or row[2] > entry[2]):
+                entry = (row[0].encode('utf-8'), row[1], row[2])
+                self._remember(self.entries, domain, entry)
+
+        if self.failed_until.get(domain, 0) > time.time():
+            return entry  # Failed recently; serve what we have (if anything) without scraping again
+
+        age = time.time() - entry[2] if entry else None
+        if entry is None or age > self.max_stale_seconds:
+            return await self.refresh(domain) or entry
+        if age > self.fresh_seconds:
+            self.refresh(domain)  # Stale-while-revalidate: answer now, refresh in the background
+        return entry
+
+    def _remember(self, cache, domain, value):
+        """Stores 'value' as the most recently used item of 'cache', evicting the least recently used beyond max_domains."""
+        cache[domain] = value
+        cache.move_to_end(domain)
+        while len(cache) > self.max_domains:
+            cache.popitem(last=False)
+
+    def refresh(self, domain):
+        """Starts (or joins) a refresh of 'domain'. Returns an awaitable of the new entry."""
+        task = self.refreshing.get(domain)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(domain))
+            self.refreshing[domain] = task
+            task.add_done_callback(lambda _: self.refreshing.pop(domain, None))
+        return task
+
+    async def _refresh(self, domain):
+        try:
+            entry = await self._fetch_and_store(domain)
+        except Exception as exc:
+            print(f"Refreshing {domain} failed: {exc!r}")
+            entry = None
+        if entry is None:
+            self._remember(self.failed_until, domain, time.time() + self.failure_seconds)
+        else:
+            self.failed_until.pop(domain, None)
+        return entry
+
+    async def _fetch_and_store(self, domain):
+        loop = asyncio.get_running_loop()
+        review_url = f"https://www.trustpilot.com/review/{domain}"
+        review_data, transparency_data = await asyncio.gather(
+            loop.run_in_executor(self.fetch_executor, self._fetch, review_url),
+            loop.run_in_executor(self.fetch_executor, self._fetch, f"{review_url}/transparency"),
+        )
+        if not review_data or not transparency_data:
+            return None
+
+        summary = await loop.run_in_executor(self.fetch_executor, summarize_domain, review_data, transparency_data)
+        fetched_at = time.time()
+        summary_json, etag = await loop.run_in_executor(
+            self.store_executor, save_snapshot, self.store, domain, review_data, transparency_data, summary, fetched_at
+        )
+        entry = (summary_json.encode('utf-8'), etag, fetched_at)
+        self._remember(self.entries, domain, entry)
+        return entry
+
+    def _fetch(self, url):
+        return fetch_next_data(url, archive_dir=self.archive_dir, client=self.egress_pool)
+
+    def close(self):
+        self.fetch_executor.shutdown(wait=False, cancel_futures=True)
+        self.store_executor.shutdown(wait=True)
+        if self.egress_pool:
+            self.egress_pool.close()
+        self.store.close()
+
+def _cached_response(request, body, etag, fetched_at, fresh_seconds):
+    """Builds a JSON response with ETag/Cache-Control, or a 304 if the client already has this version."""
+    age = max(int(time.time() - fetched_at), 0)
+    headers = {
+        'ETag': etag,
+        'Age': str(age),
+        'Cache-Control': f"public, max-age={max(fresh_seconds - age, 0)}, stale-while-revalidate={MAX_STALE_SECONDS}",
+    }
+    if etag in request.headers.get('If-None-Match', ''):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=body, content_type='application/json', headers=headers)
+
+async def get_domain(request):
+    """GET /domains/{domain}: the analyst summary of one domain."""
+    cache = request.app['cache']
+    domain = request.match_info['domain']
+    if not is_valid_domain(domain):
+        raise web.HTTPBadRequest(text=json.dumps({'error': f"Invalid domain {domain!r}"}), content_type='application/json')
+    entry = await cache.get(domain)
+    if entry is None:
+        raise web.HTTPNotFound(text=json.dumps({'error': f"No data for {domain!r}"}), content_type='application/json')
+    return _cached_response(request, *entry, cache.fresh_seconds)
+
+async def get_domains(request):
+    """
+    GET /domains?domain=a&domain=b (or ?domains=a,b): summaries of several domains as
+    {domain: summary}. Domains that cannot be fetched map to null.
+    """
+    cache = request.app['cache']
+    domains = request.query.getall('domain', [])
+    for value in request.query.getall('domains', []):
+        domains.extend(d.strip() for d in value.split(','))
+    domains = list(dict.fromkeys(d for d in domains if d))
+    if not domains:
+        raise web.HTTPBadRequest(text=json.dumps({'error': "Pass at least one domain"}), content_type='application/json')
+    if len(domains) > MAX_BATCH_DOMAINS:
+        raise web.HTTPBadRequest(
+            text=json.dumps({'error': f"At most {MAX_BATCH_DOMAINS} domains per request"}), content_type='application/json'
+        )
+    invalid = [d for d in domains if not is_valid_domain(d)]
+    if invalid:
+        raise web.HTTPBadRequest(text=json.dumps({'error': "Invalid domains", 'domains': invalid}), content_type='application/json')
+
+    entries = await asyncio.gather(*(cache.get(domain) for domain in domains))
+    # Splice the cached bytes together rather than decoding and re-encoding every summary
+    body = b'{' + b','.join(
+        json.dumps(domain).encode('utf-8') + b':' + (entry[0] if entry else b'null')
+        for domain, entry in zip(domains, entries)
+    ) + b'}'
+    etag = '"' + hashlib.blake2b(
+        ''.join(f"{domain}{entry[1] if entry else '-'}" for domain, entry in zip(domains, entries)).encode('utf-8'),
+        digest_size=12
+    ).hexdigest() + '"'
+    oldest = min((entry[2] for entry in entries if entry), default=time.time())
+    return _cached_response(request, body, etag, oldest, cache.fresh_seconds)
+
+async def health(request):
+    return web.json_response({'status': 'ok', 'cached_domains': len(request.app['cache'].entries)})
+
+def create_app(store_path=SNAPSHOT_STORE_PATH, archive_dir=ARCHIVE_DIR, route_specs=EGRESS_ROUTES, **cache_options):
+    """Builds the aiohttp application serving cached analyst summaries."""
+    app = web.Application()
+    app['cache'] = SummaryCache(store_path, archive_dir=archive_dir, route_specs=route_specs, **cache_options)
+    app.router.add_get('/health', health)
+    app.router.add_get('/domains', get_domains)
+    app.router.add_get('/domains/{domain:.+}', get_domain)
+
+    async def close_cache(app):
+        app['cache'].close()
+    app.on_cleanup.append(close_cache)
+    return app
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve cached Trustpilot analytics as JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    web.run_app(create_app(), host=args.host, port=args.port)
@@ -1,3 +1,30 @@
+import os
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SEARCH_INDEX_PATH = os.path.join(DATA_DIR, 'review_index.sqlite')
+ARCHIVE_DIR = os.path.join(DATA_DIR, 'archive')
+CRAWL_QUEUE_PATH = os.path.join(DATA_DIR, 'crawl_queue.sqlite')
+SNAPSHOT_STORE_PATH = os.path.join(DATA_DIR, 'snapshots.sqlite')
+EXPORT_DIR = os.path.join(DATA_DIR, 'exports')
+# Dashboard exports left on disk (e.g. by sessions that were closed) are removed after this long
+EXPORT_MAX_AGE_SECONDS = 24 * 60 * 60
+# Snapshots older than this are fetched again instead of being shown; the refresher
+# revisits even the quietest domain within this period
+SNAPSHOT_MAX_AGE_SECONDS = 24 * 60 * 60
+
+# Egress routes for the harvester: a proxy (None = direct) and an optional header profile each.
+# Extra proxies can be supplied as a comma-separated list in TRUSTPILOT_PROXIES.
+EGRESS_ROUTES = [
+    {'name': 'direct', 'proxy': None, 'requests_per_second': 1.0},
+] + [
+    {'name': f'proxy-{i}', 'proxy': proxy.strip(), 'requests_per_second': 1.0}
+    for i, proxy in enumerate(os.environ.get('TRUSTPILOT_PROXIES', '').split(','), start=1)
+    if proxy.strip()
+]
+# Dashboard and API requests give up (and report a failed fetch) rather than wait longer
+# than this for a route that is rate limited or cooling down; batch jobs wait indefinitely
+INTERACTIVE_MAX_WAIT_SECONDS = 10.0
+
 PREDEFINED_DOMAINS = [
     'store.manutd.com',
     'shop.fcbayern.de',
@@ -85,4 +112,4 @@ PREDEFINED_DOMAINS = [
     'aboutyou.ee',
     'aboutyou.lv',
     'aboutyou.lt'
-]
\ No newline at end of file
+]
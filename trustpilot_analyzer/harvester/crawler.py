@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlencode
+
+# Add parent directory to path to allow imports from root (ahead of this
+# directory, so that 'harvester' resolves to the package rather than harvester.py)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from harvester.harvester import fetch_next_data
+from harvester.egress import EgressPool, EgressRoute
+from analyst.analyst import extract_reviews
+
+STAR_FILTERS = [1, 2, 3, 4, 5]
+
+def build_review_page_url(domain, page=1, stars=None, language='all'):
+    """Builds a review page URL using Trustpilot's star, language and page filters."""
+    params = {'languages': language}
+    if stars is not None:
+        params['stars'] = stars
+    if page > 1:
+        params['page'] = page
+    return f"https://www.trustpilot.com/review/{domain}?{urlencode(params)}"
+
+def extract_total_pages(data):
+    """Reads the number of result pages for the current filter from the pagination block."""
+    try:
+        return int(data['props']['pageProps']['filters']['pagination']['totalPages'])
+    except (KeyError, TypeError, ValueError):
+        return 1
+
+def extract_available_languages(data):
+    """Lists the ISO codes of the review languages offered by the page's language filter."""
+    try:
+        languages = data['props']['pageProps']['filters']['languages']
+        return [lang['isoCode'] for lang in languages if isinstance(lang, dict) and lang.get('isoCode')]
+    except (KeyError, TypeError):
+        return []
+
+def crawl_review_history(domain, split_languages=False, max_workers=6, requests_per_second=3.0,
+                         max_pages_per_shard=None, retries=2, archive_dir=None, progress=None, pool=None,
+                         builder=None):
+    """
+    Harvests a domain's review history by splitting it into independent shards
+    (one per star rating, and optionally per language) and crawling their pages concurrently.
+
+    The first page of every shard reveals how many pages that shard has; all remaining
+    pages are then fetched in parallel through an egress pool, whose routes each keep
+    their own rate limit, so throughput grows with the number of routes.
+    Reviews are deduplicated by their Trustpilot ID.
+
+    Args:
+        domain: The Trustpilot domain, e.g. 'store.manutd.com'.
+        split_languages: Also shard by review language (as offered by the language filter).
+        max_workers: Number of concurrent requests.
+        requests_per_second: Request rate of the single direct route used when no pool is given.
+        max_pages_per_shard: Optional cap on pages fetched per shard.
+        retries: Extra attempts for pages that fail to fetch.
+        archive_dir: Optional raw payload archive directory passed to fetch_next_data.
+        progress: Optional callback(pages_done, pages_known) for status updates.
+        pool: Optional EgressPool to send requests through.
+        builder: Optional ReviewColumnsBuilder (created with unique_ids=True). Each page's
+            reviews are packed into it as they arrive instead of being kept as dicts.
+
+    Returns:
+        A list of unique review dicts, newest first, or the builder's ReviewColumns if
+        'builder' is given.
+    """
+    own_pool = pool is None
+    if own_pool:
+        pool = EgressPool([EgressRoute('direct', requests_per_second=requests_per_second)])
+    reviews = {}
+    pages_done = 0
+    pages_known = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def fetch(url):
+            for attempt in range(retries + 1):
+                data = fetch_next_data(url, archive_dir=archive_dir, client=pool)
+                if data:
+                    return data
+                if attempt < retries:
+                    time.sleep(2 ** attempt)
+            return None
+
+        languages = ['all']
+        if split_languages:
+            seed = fetch(build_review_page_url(domain))
+            languages = extract_available_languages(seed) or ['all']
+
+        futures = {}
+        for stars in STAR_FILTERS:
+            for language in languages:
+                url = build_review_page_url(domain, 1, stars, language)
+                futures[executor.submit(fetch, url)] = (stars, language, 1)
+        pages_known = len(futures)
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                stars, language, page = futures.pop(future)
+                data = future.result()
+                pages_done += 1
+                if data is None:
+                    print(f"Giving up on {domain} stars={stars} languages={language} page={page}.")
+                    continue
+
+                if builder is not None:
+                    builder.append(domain, extract_reviews(data))
+                else:
+                    for review in extract_reviews(data):
+                        if isinstance(review, dict) and review.get('id'):
+                            reviews[review['id']] = review
+
+                if page == 1:
+                    total_pages = extract_total_pages(data)
+                    if max_pages_per_shard:
+                        total_pages = min(total_pages, max_pages_per_shard)
+                    for next_page in range(2, total_pages + 1):
+                        url = build_review_page_url(domain, next_page, stars, language)
+                        futures[executor.submit(fetch, url)] = (stars, language, next_page)
+                    pages_known += max(total_pages - 1, 0)
+
+            if progress:
+                progress(pages_done, pages_known)
+
+    if own_pool:
+        pool.close()
+
+    if builder is not None:
+        return builder.build()
+    return sorted(
+        reviews.values(),
+        key=lambda review: (review.get('dates') or {}).get('publishedDate') or '',
+        reverse=True
+    )
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crawl a domain's full review history in star-filtered shards.")
+    parser.add_argument('domain')
+    parser.add_argument('--split-languages', action='store_true')
+    parser.add_argument('--workers', type=int, default=6)
+    parser.add_argument('--rate', type=float, default=1.0, help="Requests per second per egress route")
+    parser.add_argument('--max-pages', type=int, default=None, help="Maximum pages per shard")
+    args = parser.parse_args()
+
+    from config import EGRESS_ROUTES
+    from harvester.egress import build_egress_pool
+    from analyst.columnar import ReviewColumnsBuilder
+
+    route_specs = [dict(spec, requests_per_second=args.rate) for spec in EGRESS_ROUTES]
+    start = time.perf_counter()
+    with build_egress_pool(route_specs) as egress_pool:
+        history = crawl_review_history(
+            args.domain,
+            split_languages=args.split_languages,
+            max_workers=args.workers,
+            max_pages_per_shard=args.max_pages,
+            progress=lambda done, known: print(f"\r{done}/{known} pages", end='', flush=True),
+            pool=egress_pool,
+            builder=ReviewColumnsBuilder(unique_ids=True)
+        )
+        print()
+        print(egress_pool.stats().to_string(index=False))
+    print(f"Collected {len(history)} unique reviews ({history.nbytes() / 1e6:.1f} MB packed) "
+          f"in {time.perf_counter() - start:.1f}s.")
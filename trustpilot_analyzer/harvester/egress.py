@@ -0,0 +1,182 @@
+import threading
+import time
+
+import httpx
+import pandas as pd
+
+from .harvester import DEFAULT_HEADERS
+
+# How quickly health and latency estimates follow new observations (0..1)
+EWMA_ALPHA = 0.2
+# Latency assumed for a route that has not completed a request yet
+DEFAULT_LATENCY = 1.0
+# Status codes that mean "this route is being throttled or blocked", not "this page is broken".
+# Other 4xx responses (e.g. an unknown domain) say nothing about the route and count as successes.
+THROTTLE_STATUSES = {403, 429, 503}
+
+class EgressRoute:
+    """
+    One way out to Trustpilot: an optional proxy plus a header profile, with its own
+    rate limit, health score (EWMA of successes), latency estimate and cooldown.
+    """
+
+    def __init__(self, name, proxy=None, headers=None, requests_per_second=1.0, timeout=20.0):
+        self.name = name
+        self.proxy = proxy
+        self.client = httpx.Client(proxy=proxy, headers=headers or DEFAULT_HEADERS, follow_redirects=True, timeout=timeout)
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.next_slot = 0.0
+        self.health = 1.0
+        self.latency = None
+        self.cooldown_until = 0.0
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+
+    def expected_cost(self, now):
+        """Seconds until this route could deliver a response, inflated by poor health."""
+        wait = max(self.next_slot - now, 0.0)
+        latency = self.latency if self.latency is not None else DEFAULT_LATENCY
+        return (wait + latency * (1 + self.in_flight)) / max(self.health, 0.05)
+
+class EgressPool:
+    """
+    Schedules requests over a pool of egress routes.
+
+    Each request goes to the available route with the lowest expected cost (rate-limit wait
+    plus estimated latency, scaled by health). Throttled routes (403/429/503) are put on an
+    exponentially growing cooldown, honouring Retry-After; routes that keep failing are rested
+    until their cooldown ends. The pool has the same get(url) interface as an httpx.Client,
+    so it can be passed as the 'client' of fetch_next_data.
+
+    By default a request waits for as long as every route is cooling down, which suits batch
+    crawls. Interactive callers should set 'max_wait' (seconds): if no route will be free
+    within it, the request fails fast with an httpx.RequestError instead.
+    """
+
+    def __init__(self, routes, base_cooldown=30.0, max_cooldown=900.0, min_health=0.2, max_wait=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        if not routes:
+            raise ValueError("An egress pool needs at least one route.")
+        self.routes = list(routes)
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.min_health = min_health
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+
+    def acquire(self, max_wait=None, url=None):
+        """
+        Reserves the best route's next rate-limit slot and waits for it. Returns the route.
+        Raises httpx.RequestError if no route is free within 'max_wait' seconds (default: the
+        pool's max_wait; None waits indefinitely).
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = None if max_wait is None else self.clock() + max_wait
+        while True:
+            with self.lock:
+                now = self.clock()
+                available = [route for route in self.routes if route.cooldown_until <= now]
+                if available:
+                    route = min(available, key=lambda r: r.expected_cost(now))
+                    slot = max(route.next_slot, now)
+                    if deadline is not None and slot > deadline:
+                        raise self._unavailable(url, slot - now)
+                    route.next_slot = slot + route.interval
+                    route.in_flight += 1
+                    break
+                free_at = min(route.cooldown_until for route in self.routes)
+                if deadline is not None and free_at > deadline:
+                    raise self._unavailable(url, free_at - now)
+                wait = free_at - now
+            self.sleep(wait)
+        if slot > now:
+            self.sleep(slot - now)
+        return route
+
+    def _unavailable(self, url, wait):
+        return httpx.RequestError(
+            f"No egress route available for another {wait:.0f}s",
+            request=httpx.Request('GET', url or 'https://www.trustpilot.com/')
+        )
+
+    def release(self, route, ok, latency=None, status=None, retry_after=None):
+        """Records the outcome of a request sent through 'route'."""
+        with self.lock:
+            now = self.clock()
+            route.in_flight -= 1
+            route.requests += 1
+            route.health += EWMA_ALPHA * ((1.0 if ok else 0.0) - route.health)
+            if latency is not None:
+                route.latency = latency if route.latency is None else route.latency + EWMA_ALPHA * (latency - route.latency)
+
+            if ok:
+                route.consecutive_failures = 0
+                return
+            route.failures += 1
+            route.consecutive_failures += 1
+            if status in THROTTLE_STATUSES or route.health < self.min_health:
+                cooldown = min(self.base_cooldown * 2 ** (route.consecutive_failures - 1), self.max_cooldown)
+                if retry_after is not None:
+                    cooldown = max(cooldown, retry_after)
+                route.cooldown_until = now + cooldown
+
+    def get(self, url, max_wait=None):
+        """
+        Sends a GET request through the best available route and returns the httpx.Response.
+        Raises httpx.RequestError if no route is free within 'max_wait' (see acquire).
+        """
+        route = self.acquire(max_wait=max_wait, url=url)
+        start = self.clock()
+        response = None
+        try:
+            response = route.client.get(url)
+        finally:
+            if response is None:
+                # Any exception, not only httpx.RequestError, must hand the route back
+                self.release(route, ok=False, latency=self.clock() - start)
+
+        retry_after = response.headers.get('Retry-After')
+        self.release(
+            route,
+            ok=response.status_code < 500 and response.status_code not in THROTTLE_STATUSES,
+            latency=self.clock() - start,
+            status=response.status_code,
+            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+        )
+        return response
+
+    def stats(self):
+        """Returns a DataFrame describing every route's current health, latency and cooldown."""
+        now = self.clock()
+        with self.lock:
+            return pd.DataFrame([{
+                'route': route.name,
+                'proxy': route.proxy or 'direct',
+                'health': route.health,
+                'latency_s': route.latency,
+                'cooldown_s': max(route.cooldown_until - now, 0.0),
+                'in_flight': route.in_flight,
+                'requests': route.requests,
+                'failures': route.failures,
+            } for route in self.routes])
+
+    def close(self):
+        for route in self.routes:
+            route.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def build_egress_pool(route_specs, **pool_options):
+    """
+    Builds an EgressPool from a list of route specs (dicts with 'name' and optional
+    'proxy', 'headers', 'requests_per_second'), e.g. config.EGRESS_ROUTES.
+    """
+    return EgressPool([EgressRoute(**spec) for spec in route_specs], **pool_options)
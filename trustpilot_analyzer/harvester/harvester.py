@@ -2,24 +2,32 @@ import httpx
 import json
 from parsel import Selector
 
-def fetch_next_data(url: str):
+# Use headers to mimic a real browser request
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+def fetch_next_data(url: str, archive_dir: str = None, client: httpx.Client = None):
     """
     Fetches the __NEXT_DATA__ JSON object from a Trustpilot page.
 
     Args:
         url: The URL of the Trustpilot page to scrape.
+        archive_dir: Optional raw payload archive directory; successfully parsed
+            payloads are appended to it for later replay.
+        client: Optional shared httpx.Client or EgressPool (e.g. for crawls); a short-lived
+            client with the default headers is used otherwise.
 
     Returns:
         A dictionary containing the __NEXT_DATA__ JSON object, or None if not found.
     """
     try:
-        # Use headers to mimic a real browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        with httpx.Client(headers=headers, follow_redirects=True) as client:
+        if client is None:
+            with httpx.Client(headers=DEFAULT_HEADERS, follow_redirects=True) as own_client:
+                response = own_client.get(url)
+        else:
             response = client.get(url)
-            response.raise_for_status()  # Raise an exception for bad status codes
+        response.raise_for_status()  # Raise an exception for bad status codes
     except httpx.RequestError as exc:
         print(f"An error occurred while requesting {exc.request.url!r}.")
         return None
@@ -36,11 +44,19 @@ def fetch_next_data(url: str):
 
     try:
         next_data_json = json.loads(next_data_script)
-        return next_data_json
     except json.JSONDecodeError:
         print("Failed to decode JSON from __NEXT_DATA__.")
         return None
 
+    if archive_dir:
+        # Imported here so that callers without an archive do not need zstandard
+        from store.archive import archive_payload
+        try:
+            archive_payload(archive_dir, url, next_data_script)
+        except OSError as exc:
+            print(f"Failed to archive payload for {url!r}: {exc}")
+    return next_data_json
+
 if __name__ == '__main__':
     # Example usage:
     test_domain = "store.manutd.com"
@@ -0,0 +1,238 @@
+import os
+import socket
+import sqlite3
+import sys
+import time
+
+import pandas as pd
+
+# Add parent directory to path to allow imports from root (ahead of this
+# directory, so that 'harvester' resolves to the package rather than harvester.py)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from harvester.harvester import fetch_next_data
+from harvester.crawler import build_review_page_url, extract_total_pages
+from harvester.egress import build_egress_pool
+from analyst.analyst import extract_reviews
+from store.search_index import open_search_index, index_reviews
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_tasks (
+    domain TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    not_before REAL,
+    last_error TEXT,
+    updated_at REAL,
+    PRIMARY KEY (domain, page)
+);
+CREATE INDEX IF NOT EXISTS idx_crawl_tasks_ready ON crawl_tasks(status, priority DESC, page);
+"""
+
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 5
+# A failed task waits RETRY_BASE_SECONDS * 2^(attempts - 1), at most RETRY_MAX_SECONDS, before it is retried
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 30 * 60
+
+def open_crawl_queue(path):
+    """Opens (and creates if needed) the SQLite crawl queue at 'path'. One connection per process."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(crawl_tasks)")]
+    if 'not_before' not in columns:  # Queues created before retries were delayed
+        conn.execute("ALTER TABLE crawl_tasks ADD COLUMN not_before REAL")
+    return conn
+
+def enqueue_pages(conn, domain, pages, priority=0):
+    """Adds (domain, page) tasks. Pages already queued, running or done are left untouched."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            "INSERT OR IGNORE INTO crawl_tasks (domain, page, priority, updated_at) VALUES (?, ?, ?, ?)",
+            [(domain, page, priority, now) for page in pages]
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def enqueue_domains(conn, domains, priority=0):
+    """Seeds the queue with page 1 of each domain; the remaining pages are added once page 1 reveals the page count."""
+    for domain in domains:
+        enqueue_pages(conn, domain, [1], priority=priority)
+
+def lease_task(conn, worker, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+    """
+    Atomically claims the highest-priority runnable task for 'worker'.
+    Tasks whose lease expired (e.g. their worker crashed) become runnable again, until
+    they have used up 'max_attempts'. Failed tasks are skipped until their retry delay
+    ('not_before') has passed. Returns (domain, page, attempts) or None.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "UPDATE crawl_tasks SET status = 'failed', last_error = 'lease expired', updated_at = ? "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, now, max_attempts)
+        )
+        row = conn.execute(
+            "UPDATE crawl_tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+            "attempts = attempts + 1, updated_at = ? "
+            "WHERE rowid = ("
+            "  SELECT rowid FROM crawl_tasks "
+            "  WHERE (status = 'pending' AND (not_before IS NULL OR not_before <= ?)) "
+            "     OR (status = 'leased' AND lease_expires < ?) "
+            "  ORDER BY priority DESC, page LIMIT 1"
+            ") RETURNING domain, page, attempts",
+            (worker, now + lease_seconds, now, now, now)
+        ).fetchone()
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return row
+
+def complete_task(conn, worker, domain, page):
+    """Checkpoints a task as done. Returns False if the lease had already passed to another worker."""
+    cursor = conn.execute(
+        "UPDATE crawl_tasks SET status = 'done', lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+        "WHERE domain = ? AND page = ? AND status = 'leased' AND lease_owner = ?",
+        (time.time(), domain, page, worker)
+    )
+    return cursor.rowcount == 1
+
+def fail_task(conn, worker, domain, page, error, max_attempts=MAX_ATTEMPTS):
+    """
+    Returns a task to the queue for a retry after an exponentially growing delay,
+    or marks it failed once it has used up 'max_attempts'.
+    """
+    now = time.time()
+    conn.execute(
+        "UPDATE crawl_tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+        "not_before = ? + min(? * (1 << (attempts - 1)), ?), "
+        "lease_owner = NULL, lease_expires = NULL, last_error = ?, updated_at = ? "
+        "WHERE domain = ? AND page = ? AND status = 'leased' AND lease_owner = ?",
+        (max_attempts, now, RETRY_BASE_SECONDS, RETRY_MAX_SECONDS, str(error), now, domain, page, worker)
+    )
+
+def next_retry_at(conn):
+    """Returns the earliest time a delayed pending task becomes runnable, or None if there is none."""
+    return conn.execute(
+        "SELECT MIN(not_before) FROM crawl_tasks WHERE status = 'pending' AND not_before > ?", (time.time(),)
+    ).fetchone()[0]
+
+def crawl_progress(conn):
+    """Returns a DataFrame with one row per domain and a column per task status."""
+    df = pd.read_sql_query("SELECT domain, status, COUNT(*) AS tasks FROM crawl_tasks GROUP BY domain, status", conn)
+    if df.empty:
+        return df
+    return df.pivot(index='domain', columns='status', values='tasks').fillna(0).astype(int).reset_index()
+
+def run_worker(queue_path, index_path, archive_dir=None, route_specs=None, worker=None,
+               lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS, idle_timeout=30.0, builder=None):
+    """
+    Drains the crawl queue until no task has been runnable for 'idle_timeout' seconds.
+    Fetched pages are archived (if 'archive_dir' is set) and their reviews indexed before
+    the task is checkpointed, so a restarted run never re-fetches a completed page.
+    Page 1 of a domain enqueues the domain's remaining pages at the same priority.
+    Waiting for a free egress route is capped at half the lease, so a throttled fetch fails
+    (and is retried later) instead of outliving its lease and being fetched twice.
+    If a ReviewColumnsBuilder is given, every fetched page's reviews are also packed into it.
+    Returns the number of pages completed by this worker.
+    """
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    conn = open_crawl_queue(queue_path)
+    search_index = open_search_index(index_path)
+    pool = build_egress_pool(route_specs, max_wait=lease_seconds / 2) if route_specs else None
+    completed = 0
+    idle_since = None
+
+    try:
+        while True:
+            task = lease_task(conn, worker, lease_seconds=lease_seconds, max_attempts=max_attempts)
+            if task is None:
+                retry_at = next_retry_at(conn)
+                if retry_at is not None:
+                    # Work remains, it is just backing off: wait for it rather than exiting
+                    idle_since = None
+                    time.sleep(min(max(retry_at - time.time(), 1.0), idle_timeout))
+                    continue
+                idle_since = idle_since or time.monotonic()
+                if time.monotonic() - idle_since > idle_timeout:
+                    break
+                time.sleep(1.0)
+                continue
+            idle_since = None
+
+            domain, page, _ = task
+            data = fetch_next_data(build_review_page_url(domain, page), archive_dir=archive_dir, client=pool)
+            if data is None:
+                fail_task(conn, worker, domain, page, "fetch failed", max_attempts=max_attempts)
+                continue
+
+            reviews = extract_reviews(data)
+            index_reviews(search_index, domain, reviews)
+            if builder is not None:
+                builder.append(domain, reviews)
+            if page == 1:
+                priority = conn.execute(
+                    "SELECT priority FROM crawl_tasks WHERE domain = ? AND page = 1", (domain,)
+                ).fetchone()[0]
+                enqueue_pages(conn, domain, range(2, extract_total_pages(data) + 1), priority=priority)
+            if complete_task(conn, worker, domain, page):
+                completed += 1
+    finally:
+        if pool:
+            pool.close()
+        search_index.close()
+        conn.close()
+    return completed
+
+if __name__ == '__main__':
+    import argparse
+    from multiprocessing import Process
+
+    from config import PREDEFINED_DOMAINS, CRAWL_QUEUE_PATH, SEARCH_INDEX_PATH, ARCHIVE_DIR, EGRESS_ROUTES
+
+    parser = argparse.ArgumentParser(description="Resumable full-history crawl of review pages.")
+    parser.add_argument('--seed', action='store_true', help="Queue page 1 of every predefined domain")
+    parser.add_argument('--domain', action='append', default=[], help="Queue page 1 of this domain (repeatable)")
+    parser.add_argument('--priority', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=4, help="Worker processes")
+    parser.add_argument('--status', action='store_true', help="Only print queue progress")
+    args = parser.parse_args()
+
+    queue = open_crawl_queue(CRAWL_QUEUE_PATH)
+    if args.seed:
+        enqueue_domains(queue, PREDEFINED_DOMAINS, priority=args.priority)
+    if args.domain:
+        enqueue_domains(queue, args.domain, priority=args.priority)
+
+    if not args.status:
+        # Each process schedules its own routes, so split every route's rate limit between them
+        route_specs = [
+            dict(spec, requests_per_second=spec.get('requests_per_second', 1.0) / args.workers)
+            for spec in EGRESS_ROUTES
+        ]
+        workers = [
+            Process(target=run_worker, args=(CRAWL_QUEUE_PATH, SEARCH_INDEX_PATH, ARCHIVE_DIR, route_specs))
+            for _ in range(args.workers)
+        ]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+
+    print(crawl_progress(queue).to_string(index=False))
+    queue.close()
@@ -0,0 +1,163 @@
+import heapq
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Add parent directory to path to allow imports from root (ahead of this
+# directory, so that 'refresher' resolves to the package rather than refresher.py)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from harvester.harvester import fetch_next_data
+from harvester.egress import build_egress_pool
+from analyst.analyst import extract_reviews, summarize_domain
+from store.snapshots import (
+    open_snapshot_store,
+    save_snapshot,
+    list_snapshots,
+    view_counts,
+    tracked_domains
+)
+from store.search_index import open_search_index, index_reviews
+from config import (
+    PREDEFINED_DOMAINS,
+    SNAPSHOT_STORE_PATH,
+    SNAPSHOT_MAX_AGE_SECONDS,
+    SEARCH_INDEX_PATH,
+    ARCHIVE_DIR,
+    EGRESS_ROUTES
+)
+
+# No domain is refreshed more often than this, however busy or popular
+MIN_REFRESH_SECONDS = 15 * 60
+# A domain is due once it has probably collected this many new reviews (weighted by views)
+TARGET_NEW_REVIEWS = 5
+# Each recent dashboard view makes a domain's new reviews count this much more
+VIEW_WEIGHT = 0.5
+
+def review_velocity(summary):
+    """
+    Estimated new reviews per day from a stored summary: the larger of the last
+    7 days' count and the latest month of the reviews-over-time series.
+    """
+    recent = (summary.get('recentReviews7d') or 0) / 7
+    months = summary.get('reviewsOverTime') or []
+    monthly = (months[-1].get('count') or 0) / 30 if months else 0
+    return max(recent, monthly)
+
+def refresh_interval(velocity, views=0.0):
+    """
+    Seconds between refreshes: the time a domain takes to collect TARGET_NEW_REVIEWS,
+    with every recent view counting VIEW_WEIGHT extra, clamped to
+    [MIN_REFRESH_SECONDS, SNAPSHOT_MAX_AGE_SECONDS].
+    """
+    rate = velocity * (1 + VIEW_WEIGHT * views) / 86400
+    if rate <= 0:
+        return SNAPSHOT_MAX_AGE_SECONDS
+    return min(max(TARGET_NEW_REVIEWS / rate, MIN_REFRESH_SECONDS), SNAPSHOT_MAX_AGE_SECONDS)
+
+def build_refresh_schedule(conn, domains, now=None):
+    """
+    Builds a heap of (due_at, -views, domain) for 'domains' plus every tracked domain.
+    Domains without a snapshot are due immediately, most viewed first.
+    """
+    now = now or time.time()
+    snapshots = list_snapshots(conn)
+    views = view_counts(conn, now)
+    schedule = []
+    for domain in dict.fromkeys(list(domains) + tracked_domains(conn)):
+        domain_views = views.get(domain, 0.0)
+        if domain in snapshots:
+            fetched_at, summary_json = snapshots[domain]
+            due_at = fetched_at + refresh_interval(review_velocity(json.loads(summary_json)), domain_views)
+        else:
+            due_at = 0.0
+        schedule.append((due_at, -domain_views, domain))
+    heapq.heapify(schedule)
+    return schedule
+
+def fetch_domain(domain, client=None, archive_dir=None):
+    """Fetches and summarizes one domain. Returns (review_data, transparency_data, summary), or None on failure."""
+    review_url = f"https://www.trustpilot.com/review/{domain}"
+    review_data = fetch_next_data(review_url, archive_dir=archive_dir, client=client)
+    transparency_data = fetch_next_data(f"{review_url}/transparency", archive_dir=archive_dir, client=client)
+    if not review_data or not transparency_data:
+        return None
+    return review_data, transparency_data, summarize_domain(review_data, transparency_data)
+
+def run_refresher(store_path=SNAPSHOT_STORE_PATH, index_path=SEARCH_INDEX_PATH, archive_dir=ARCHIVE_DIR,
+                  route_specs=EGRESS_ROUTES, domains=PREDEFINED_DOMAINS, workers=4, poll_seconds=60.0, once=False):
+    """
+    Keeps the snapshot store warm. Each round rebuilds the schedule (so new views and
+    domains are picked up), refreshes the due domains most urgent first, then sleeps until
+    the next domain is due or 'poll_seconds' have passed. Failed domains back off
+    exponentially. With once=True, returns after the first round that finds nothing due.
+    Returns the number of domains refreshed.
+    """
+    conn = open_snapshot_store(store_path)
+    search_index = open_search_index(index_path)
+    pool = build_egress_pool(route_specs) if route_specs else None
+    failures = {}
+    retry_at = {}
+    refreshed = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                now = time.time()
+                schedule = build_refresh_schedule(conn, domains, now)
+                due = []
+                while schedule and schedule[0][0] <= now and len(due) < workers:
+                    _, _, domain = heapq.heappop(schedule)
+                    if retry_at.get(domain, 0) <= now:
+                        due.append(domain)
+
+                if not due:
+                    if once:
+                        break
+                    next_due = min((max(due_at, retry_at.get(domain, 0)) for due_at, _, domain in schedule),
+                                   default=now + poll_seconds)
+                    time.sleep(min(max(next_due - now, 1.0), poll_seconds))
+                    continue
+
+                futures = {executor.submit(fetch_domain, domain, pool, archive_dir): domain for domain in due}
+                for future in as_completed(futures):
+                    domain = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as exc:
+                        print(f"Refreshing {domain} failed: {exc!r}")
+                        result = None
+                    if result is None:
+                        failures[domain] = failures.get(domain, 0) + 1
+                        retry_at[domain] = time.time() + min(
+                            MIN_REFRESH_SECONDS * 2 ** (failures[domain] - 1), SNAPSHOT_MAX_AGE_SECONDS
+                        )
+                        continue
+
+                    # Writes stay on this thread, which owns the connections
+                    review_data, transparency_data, summary = result
+                    save_snapshot(conn, domain, review_data, transparency_data, summary)
+                    index_reviews(search_index, domain, extract_reviews(review_data))
+                    failures.pop(domain, None)
+                    retry_at.pop(domain, None)
+                    refreshed += 1
+    finally:
+        if pool:
+            pool.close()
+        search_index.close()
+        conn.close()
+    return refreshed
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Keep domain snapshots fresh in the background.")
+    parser.add_argument('--workers', type=int, default=4, help="Domains refreshed concurrently")
+    parser.add_argument('--poll', type=float, default=60.0, help="Maximum seconds between schedule checks")
+    parser.add_argument('--once', action='store_true', help="Refresh whatever is due, then exit")
+    args = parser.parse_args()
+
+    count = run_refresher(workers=args.workers, poll_seconds=args.poll, once=args.once)
+    print(f"Refreshed {count} domains.")
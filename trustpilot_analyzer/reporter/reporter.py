@@ -3,11 +3,15 @@ import pandas as pd
 import plotly.express as px
 import sys
 import os
+import shutil
+import tempfile
+import time
 
 # Add parent directory to path to allow imports from root
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from harvester.harvester import fetch_next_data
+from harvester.egress import build_egress_pool
 from analyst.analyst import (
     extract_aggregate_star_distribution,
     extract_main_page_star_distribution,
@@ -15,9 +19,29 @@ from analyst.analyst import (
     extract_source_distribution,
     extract_detailed_monthly_distribution,
     calculate_recent_reviews_count,
-    analyze_reply_behavior
+    analyze_reply_behavior,
+    extract_reviews,
+    extract_business_info,
+    summarize_domain
+)
+from analyst.anomalies import detect_volume_anomalies
+from analyst.sketches import latency_summary
+from analyst.trends import term_trends
+from analyst.replay import archived_reviews
+from analyst.export import FORMATS as EXPORT_FORMATS, export_domains, zip_export, remove_stale_exports
+from store.search_index import open_search_index, index_reviews, search_reviews, indexed_domains
+from store.snapshots import open_snapshot_store, load_snapshot, save_snapshot, record_view, track_domain
+from config import (
+    PREDEFINED_DOMAINS,
+    SEARCH_INDEX_PATH,
+    ARCHIVE_DIR,
+    EGRESS_ROUTES,
+    SNAPSHOT_STORE_PATH,
+    SNAPSHOT_MAX_AGE_SECONDS,
+    EXPORT_DIR,
+    EXPORT_MAX_AGE_SECONDS,
+    INTERACTIVE_MAX_WAIT_SECONDS
 )
-from config import PREDEFINED_DOMAINS
 
 #RATING_COLOR_MAP = {
 #    "1": "#E53935",  # Adjusted Red: Less neon, more professional
@@ -43,15 +67,126 @@ RATING_COLOR_MAP = {
     "5": "#2ED573"   # Emerald Green
 }
 
-def extract_business_info(data):
-    """Extracts business unit info from the main data object."""
-    if not data:
-        return None
-    try:
-        return data['props']['pageProps']['businessUnit']
-    except (KeyError, TypeError):
+@st.cache_resource
+def get_search_index():
+    """Opens the review search index once per server process."""
+    return open_search_index(SEARCH_INDEX_PATH)
+
+@st.cache_resource
+def get_egress_pool():
+    """Shares one egress route pool (and its health tracking) across all sessions."""
+    return build_egress_pool(EGRESS_ROUTES, max_wait=INTERACTIVE_MAX_WAIT_SECONDS)
+
+@st.cache_resource
+def get_snapshot_store():
+    """Opens the snapshot store kept warm by the refresher once per server process."""
+    return open_snapshot_store(SNAPSHOT_STORE_PATH)
+
+def load_domain_data(domain, count_view=True, max_age=SNAPSHOT_MAX_AGE_SECONDS):
+    """
+    Returns (review_data, transparency_data, fetched_at) for 'domain', or (None, None, None)
+    if it cannot be fetched. Snapshots from the refresher younger than 'max_age' seconds are
+    used as-is (max_age=0 always fetches live); otherwise the pages are fetched live and
+    stored for other sessions. Each call counts as a view, which makes the refresher revisit the
+    domain sooner, and successfully fetched custom domains are added to the refresher's list.
+    """
+    store = get_snapshot_store()
+    if count_view:
+        record_view(store, domain)
+    snapshot = load_snapshot(store, domain)
+    if snapshot and time.time() - snapshot['fetched_at'] < max_age:
+        return snapshot['review_data'], snapshot['transparency_data'], snapshot['fetched_at']
+
+    review_url = f"https://www.trustpilot.com/review/{domain}"
+    transparency_url = f"{review_url}/transparency"
+    review_data = fetch_next_data(review_url, archive_dir=ARCHIVE_DIR, client=get_egress_pool())
+    transparency_data = fetch_next_data(transparency_url, archive_dir=ARCHIVE_DIR, client=get_egress_pool())
+    if not review_data or not transparency_data:
+        return None, None, None
+
+    fetched_at = time.time()
+    save_snapshot(store, domain, review_data, transparency_data, summarize_domain(review_data, transparency_data),
+                  fetched_at)
+    index_reviews(get_search_index(), domain, extract_reviews(review_data))
+    if domain not in PREDEFINED_DOMAINS:
+        track_domain(store, domain)
+    return review_data, transparency_data, fetched_at
+
+def format_fetched_at(fetched_at):
+    """Describes when data was fetched, e.g. '2025-03-01 14:05 UTC (3.2 hours ago)'."""
+    hours = max(time.time() - fetched_at, 0) / 3600
+    age = f"{hours * 60:.0f} minutes ago" if hours < 1 else f"{hours:.1f} hours ago"
+    return f"{time.strftime('%Y-%m-%d %H:%M UTC', time.gmtime(fetched_at))} ({age})"
+
+@st.cache_data(ttl=15 * 60, show_spinner=False)
+def archived_term_trends(domain):
+    """Rising and falling review terms of 'domain', from every review page captured in the archive."""
+    if not ARCHIVE_DIR or not os.path.isdir(ARCHIVE_DIR):
+        return pd.DataFrame()
+    reviews = archived_reviews(ARCHIVE_DIR, domain_filter=domain).get(domain, [])
+    return term_trends({domain: reviews}, top_n=10)
+
+def analyze_comparison_domain(domain, max_age=SNAPSHOT_MAX_AGE_SECONDS):
+    """
+    Loads one domain and computes everything the comparison tab shows for it.
+    Returns {'metrics': dict, 'star_dist', 'time_dist', 'source_dist', 'detailed': DataFrame}, or None if the fetch failed.
+    """
+    review_data, transparency_data, fetched_at = load_domain_data(domain, max_age=max_age)
+    if not review_data or not transparency_data:
         return None
 
+    reviews = extract_reviews(review_data)
+
+    info = extract_business_info(review_data)
+    reply_stats = analyze_reply_behavior(transparency_data)
+    reply_days = latency_summary(reviews).get('reply_days', {})
+    metrics = {
+        "Domain": domain,
+        "TrustScore": info.get('trustScore'),
+        "Total Reviews": info.get('numberOfReviews'),
+        "New Reviews (7d)": calculate_recent_reviews_count(review_data),
+        "Reply Rate (%)": reply_stats.get('replyPercentage', 0) if reply_stats else 0,
+        "Avg Reply Time (Days)": reply_stats.get('averageDaysToReply') if reply_stats else None,
+        "p90 Reply Time (Days)": reply_days.get('p90'),
+        "Data Fetched (UTC)": time.strftime('%Y-%m-%d %H:%M', time.gmtime(fetched_at))
+    }
+    return {
+        'metrics': metrics,
+        'star_dist': extract_main_page_star_distribution(review_data).assign(Domain=domain),
+        'time_dist': extract_reviews_over_time(transparency_data).assign(Domain=domain),
+        'source_dist': extract_source_distribution(transparency_data).assign(Domain=domain),
+        'detailed': extract_detailed_monthly_distribution(transparency_data),
+    }
+
+COMBINED_COMPARISON_FRAMES = ('star_dist', 'time_dist', 'source_dist')
+
+def update_comparison_frames(frames, results, domains):
+    """
+    Brings the combined comparison frames in line with 'domains' (in order), given the
+    per-domain 'results'. Rows of dropped domains are filtered out and only newly added
+    domains are appended, so nothing already combined is rebuilt.
+    """
+    domains = [d for d in domains if d in results]
+    previous = frames.get('domains', [])
+    kept = [d for d in previous if d in domains]
+    added = [d for d in domains if d not in previous]
+
+    updated = {'domains': kept + added}
+    metrics = [results[d]['metrics'] for d in added]
+    old_metrics = frames.get('metrics', pd.DataFrame())
+    if not old_metrics.empty:
+        old_metrics = old_metrics[old_metrics['Domain'].isin(kept)]
+    updated['metrics'] = pd.concat([old_metrics, pd.DataFrame(metrics)], ignore_index=True) if metrics else old_metrics
+
+    for name in COMBINED_COMPARISON_FRAMES:
+        old = frames.get(name, pd.DataFrame())
+        if not old.empty:
+            old = old[old['Domain'].isin(kept)]
+        pieces = [old] + [results[d][name] for d in added if not results[d][name].empty]
+        pieces = [piece for piece in pieces if not piece.empty]
+        updated[name] = pd.concat(pieces, ignore_index=True) if pieces else pd.DataFrame()
+    return updated
+
 st.set_page_config(page_title="Trustpilot Analyzer", layout="wide")
 
 # Custom CSS for Scandi/Modern look
@@ -187,7 +322,7 @@ st.markdown(
 st.title("Trustpilot Review Analyzer")
 
 # Create Tabs
-tab1, tab2 = st.tabs(["Single Domain Analysis", "Domain Comparison"])
+tab1, tab2, tab3 = st.tabs(["Single Domain Analysis", "Domain Comparison", "Review Search"])
 
 # --- TAB 1: Single Domain Analysis ---
 with tab1:
@@ -198,6 +333,8 @@ with tab1:
         st.session_state["review_data"] = None
     if "transparency_data" not in st.session_state:
         st.session_state["transparency_data"] = None
+    if "fetched_at" not in st.session_state:
+        st.session_state["fetched_at"] = None
     if "domain" not in st.session_state:
         st.session_state["domain"] = ""
 
@@ -216,24 +353,24 @@ with tab1:
     )
 
     domain_input = st.text_input("Enter domain:", key="domain_input_val")
+    fetch_live = st.checkbox("Fetch live data (ignore stored snapshots)")
 
     if st.button("Analyze Domain"):
         if domain_input:
-            review_url = f"https://www.trustpilot.com/review/{domain_input}"
-            transparency_url = f"{review_url}/transparency"
-
-            with st.spinner(f"Scraping data for {domain_input}..."):
-                review_data = fetch_next_data(review_url)
-                transparency_data = fetch_next_data(transparency_url)
+            with st.spinner(f"Loading data for {domain_input}..."):
+                review_data, transparency_data, fetched_at = load_domain_data(
+                    domain_input, max_age=0 if fetch_live else SNAPSHOT_MAX_AGE_SECONDS
+                )
             
             if not review_data or not transparency_data:
                 st.error(f"Failed to fetch all necessary data for '{domain_input}'. Please check the domain and try again.")
             else:
                 st.session_state["review_data"] = review_data
                 st.session_state["transparency_data"] = transparency_data
+                st.session_state["fetched_at"] = fetched_at
                 st.session_state["domain"] = domain_input
                 st.session_state["analyzed"] = True
-                st.success(f"Successfully scraped data for **{domain_input}**.")
+                st.success(f"Successfully loaded data for **{domain_input}**.")
         else:
             st.warning("Please enter a domain to analyze.")
 
@@ -241,6 +378,8 @@ with tab1:
         domain = st.session_state["domain"]
         review_data = st.session_state["review_data"]
         transparency_data = st.session_state["transparency_data"]
+        if st.session_state["fetched_at"] is not None:
+            st.caption(f"Data fetched {format_fetched_at(st.session_state['fetched_at'])}.")
 
         # --- Section 1: Overall Performance ---
         with st.container(border=True):
@@ -438,12 +577,39 @@ with tab1:
                 replied = reply_stats.get('negativeReviewsWithRepliesCount', 0)
                 total = reply_stats.get('totalNegativeReviewsCount', 0)
                 col_act4.metric("Replied / Total (Negative, 1 & 2 Stars)", f"{replied} / {total}")
+
+                # Reply-time percentiles from the individual reviews on the page, not Trustpilot's average
+                reply_days = latency_summary(extract_reviews(review_data)).get('reply_days')
+                if reply_days:
+                    st.caption(f"Reply time on the {reply_days['count']} most recent replied reviews (days):")
+                    col_p1, col_p2, col_p3 = st.columns(3)
+                    col_p1.metric("Median Reply Time", f"{reply_days['p50']:.1f}")
+                    col_p2.metric("p90 Reply Time", f"{reply_days['p90']:.1f}")
+                    col_p3.metric("p99 Reply Time", f"{reply_days['p99']:.1f}")
             else:
                 st.warning("Could not find 'Company Activity' data. The following data keys were available:")
                 # For debugging, let's see what keys are available
                 if transparency_data and 'props' in transparency_data and 'pageProps' in transparency_data['props']:
                     st.json(list(transparency_data['props']['pageProps'].keys()))
 
+        # --- Section 4: Review Term Trends ---
+        with st.container(border=True):
+            st.header("Review Term Trends")
+            with st.spinner("Reading archived reviews..."):
+                trends_df = archived_term_trends(domain)
+            if trends_df.empty:
+                st.info("Not enough archived review history to compare the last 3 months with earlier ones.")
+            else:
+                st.caption("Terms used more (rising) or less (falling) in the last 3 months' reviews than before, from archived review pages.")
+                col_rising, col_falling = st.columns(2)
+                for column, direction in ((col_rising, 'rising'), (col_falling, 'falling')):
+                    with column:
+                        st.subheader(direction.title())
+                        st.dataframe(
+                            trends_df[trends_df['direction'] == direction][['term', 'recent_count', 'prior_count', 'score']],
+                            use_container_width=True, hide_index=True
+                        )
+
         # --- Footer ---
         st.markdown("---")
         st.markdown(f"**Source:** [https://www.trustpilot.com/review/{domain}](https://www.trustpilot.com/review/{domain})", unsafe_allow_html=True)
@@ -451,6 +617,17 @@ with tab1:
 # --- TAB 2: Domain Comparison ---
 with tab2:
     st.markdown("<h2 style='font-size: 1.8rem;'>Compare Multiple Domains</h2>", unsafe_allow_html=True)
+
+    # Per-domain results survive reruns, so changing the selection only fetches new domains
+    if "comparison_results" not in st.session_state:
+        st.session_state["comparison_results"] = {}
+    if "comparison_frames" not in st.session_state:
+        st.session_state["comparison_frames"] = {}
+    if "comparison_domains" not in st.session_state:
+        st.session_state["comparison_domains"] = []
+    if "comparison_export" not in st.session_state:
+        st.session_state["comparison_export"] = None
+    comparison_results = st.session_state["comparison_results"]
     
     selected_domains = st.multiselect(
         "Select domains to compare:", 
@@ -459,176 +636,264 @@ with tab2:
     )
     
     custom_domains_input = st.text_input("Add custom domains (comma-separated):")
-    
-    if st.button("Run Comparison"):
+
+    col_run, col_reload = st.columns([1, 4])
+    with col_run:
+        run_comparison = st.button("Run Comparison")
+    with col_reload:
+        reload_comparison = st.button("Reload All")
+
+    if reload_comparison:
+        comparison_results.clear()
+        st.session_state["comparison_frames"] = {}
+
+    if run_comparison or reload_comparison:
         custom_domains = [d.strip() for d in custom_domains_input.split(",") if d.strip()]
         all_domains = list(dict.fromkeys(selected_domains + custom_domains))
         
         if not all_domains:
             st.warning("Please select at least one domain.")
         else:
-            comparison_metrics = []
-            all_star_dists = []
-            all_reviews_over_time = []
-            all_source_dists = []
-            
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            for i, domain in enumerate(all_domains):
-                status_text.text(f"Fetching data for {domain}...")
-                review_url = f"https://www.trustpilot.com/review/{domain}"
-                transparency_url = f"{review_url}/transparency"
+            new_domains = [d for d in all_domains if d not in comparison_results]
+            if new_domains:
+                progress_bar = st.progress(0)
+                status_text = st.empty()
                 
-                try:
-                    review_data = fetch_next_data(review_url)
-                    transparency_data = fetch_next_data(transparency_url)
+                for i, domain in enumerate(new_domains):
+                    status_text.text(f"Loading data for {domain}...")
+                    try:
+                        # Reload All always fetches live rather than re-reading stored snapshots
+                        max_age = 0 if reload_comparison else SNAPSHOT_MAX_AGE_SECONDS
+                        result = analyze_comparison_domain(domain, max_age=max_age)
+                        if result:
+                            comparison_results[domain] = result
+                        else:
+                            st.error(f"Failed to fetch all necessary data for '{domain}'.")
+                    except Exception as e:
+                        st.error(f"Error processing {domain}: {str(e)}")
                     
-                    if review_data and transparency_data:
-                        # 1. Metrics
-                        info = extract_business_info(review_data)
-                        recent_count = calculate_recent_reviews_count(review_data)
-                        reply_stats = analyze_reply_behavior(transparency_data)
-                        
-                        domain_stats = {
-                            "Domain": domain,
-                            "TrustScore": info.get('trustScore'),
-                            "Total Reviews": info.get('numberOfReviews'),
-                            "New Reviews (7d)": recent_count,
-                            "Reply Rate (%)": reply_stats.get('replyPercentage', 0) if reply_stats else 0,
-                            "Avg Reply Time (Days)": reply_stats.get('averageDaysToReply') if reply_stats else None
-                        }
-                        comparison_metrics.append(domain_stats)
-                        
-                        # 2. Star Distribution (All Time)
-                        star_dist = extract_main_page_star_distribution(review_data)
-                        if not star_dist.empty:
-                            star_dist['Domain'] = domain
-                            all_star_dists.append(star_dist)
-                            
-                        # 3. Reviews Over Time
-                        time_dist = extract_reviews_over_time(transparency_data)
-                        if not time_dist.empty:
-                            time_dist['Domain'] = domain
-                            all_reviews_over_time.append(time_dist)
-                            
-                        # 4. Source Distribution
-                        source_dist = extract_source_distribution(transparency_data)
-                        if not source_dist.empty:
-                            source_dist['Domain'] = domain
-                            all_source_dists.append(source_dist)
-                            
-                except Exception as e:
-                    st.error(f"Error processing {domain}: {str(e)}")
-                
-                progress_bar.progress((i + 1) / len(all_domains))
-            
-            status_text.empty()
-            progress_bar.empty()
-            
-            if comparison_metrics:
-                # --- Metrics Table ---
-                st.subheader("Key Metrics Comparison")
-                metrics_df = pd.DataFrame(comparison_metrics)
-                st.dataframe(metrics_df, use_container_width=True)
+                    progress_bar.progress((i + 1) / len(new_domains))
                 
-                # --- Visualizations ---
-                
-                # 1. TrustScore Comparison
-                col1, col2 = st.columns(2)
-                with col1:
-                    fig_ts = px.bar(
-                        metrics_df, 
-                        x='Domain', 
-                        y='TrustScore', 
-                        title="TrustScore Comparison",
-                        color='Domain',
-                        template="plotly_white"
-                    )
-                    fig_ts.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
-                    st.plotly_chart(fig_ts, use_container_width=True)
-                
-                with col2:
-                    fig_new = px.bar(
-                        metrics_df, 
-                        x='Domain', 
-                        y='New Reviews (7d)', 
-                        title="New Reviews (Last 7 Days)",
-                        color='Domain',
-                        template="plotly_white"
-                    )
-                    fig_new.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
-                    st.plotly_chart(fig_new, use_container_width=True)
-
-                # 2. Star Distribution Comparison
-                if all_star_dists:
-                    st.subheader("Star Rating Distribution (All Time)")
-                    combined_star_df = pd.concat(all_star_dists)
-                    combined_star_df['rating'] = combined_star_df['rating'].astype(str)
-                    
-                    fig_star = px.bar(
-                        combined_star_df,
-                        x='percentage',
-                        y='rating',
-                        color='Domain',
-                        barmode='group',
-                        orientation='h',
-                        title="Star Rating Distribution by Domain",
-                        labels={'percentage': 'Percentage (%)', 'rating': 'Stars'},
-                        category_orders={'rating': ["5", "4", "3", "2", "1"]},
-                        template="plotly_white"
-                    )
-                    fig_star.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
-                    st.plotly_chart(fig_star, use_container_width=True)
+                status_text.empty()
+                progress_bar.empty()
 
-                # 3. Reviews Over Time Comparison
-                if all_reviews_over_time:
-                    st.subheader("Reviews Over Time (Past 12 Months)")
-                    combined_time_df = pd.concat(all_reviews_over_time)
-                    
-                    fig_time = px.line(
-                        combined_time_df,
-                        x='date',
-                        y='count',
-                        color='Domain',
-                        title="Review Volume Trends",
-                        markers=True,
-                        template="plotly_white"
-                    )
-                    fig_time.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
-                    st.plotly_chart(fig_time, use_container_width=True)
+            st.session_state["comparison_domains"] = all_domains
+            if not any(d in comparison_results for d in all_domains):
+                st.error("No data could be fetched for the selected domains.")
 
-                # 4. Additional Comparisons
-                col3, col4 = st.columns(2)
-                
-                with col3:
-                    st.subheader("Reply Rate Comparison")
-                    fig_reply = px.bar(
-                        metrics_df,
-                        x='Domain',
-                        y='Reply Rate (%)',
-                        color='Domain',
-                        title="Negative Review Reply Rate",
-                        template="plotly_white"
-                    )
-                    fig_reply.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
-                    st.plotly_chart(fig_reply, use_container_width=True)
+    comparison_domains = [d for d in st.session_state["comparison_domains"] if d in comparison_results]
+    if comparison_domains:
+        frames = update_comparison_frames(st.session_state["comparison_frames"], comparison_results, comparison_domains)
+        st.session_state["comparison_frames"] = frames
+        metrics_df = frames['metrics']
+        combined_star_df = frames['star_dist']
+        combined_time_df = frames['time_dist']
+        combined_source_df = frames['source_dist']
+
+        # --- Metrics Table ---
+        st.subheader("Key Metrics Comparison")
+        st.dataframe(metrics_df, use_container_width=True)
+        
+        # --- Visualizations ---
+        
+        # 1. TrustScore Comparison
+        col1, col2 = st.columns(2)
+        with col1:
+            fig_ts = px.bar(
+                metrics_df, 
+                x='Domain', 
+                y='TrustScore', 
+                title="TrustScore Comparison",
+                color='Domain',
+                template="plotly_white"
+            )
+            fig_ts.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+            st.plotly_chart(fig_ts, use_container_width=True)
+        
+        with col2:
+            fig_new = px.bar(
+                metrics_df, 
+                x='Domain', 
+                y='New Reviews (7d)', 
+                title="New Reviews (Last 7 Days)",
+                color='Domain',
+                template="plotly_white"
+            )
+            fig_new.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+            st.plotly_chart(fig_new, use_container_width=True)
+
+        # 2. Star Distribution Comparison
+        if not combined_star_df.empty:
+            st.subheader("Star Rating Distribution (All Time)")
+            combined_star_df = combined_star_df.assign(rating=combined_star_df['rating'].astype(str))
+            
+            fig_star = px.bar(
+                combined_star_df,
+                x='percentage',
+                y='rating',
+                color='Domain',
+                barmode='group',
+                orientation='h',
+                title="Star Rating Distribution by Domain",
+                labels={'percentage': 'Percentage (%)', 'rating': 'Stars'},
+                category_orders={'rating': ["5", "4", "3", "2", "1"]},
+                template="plotly_white"
+            )
+            fig_star.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+            st.plotly_chart(fig_star, use_container_width=True)
+
+        # 3. Reviews Over Time Comparison
+        if not combined_time_df.empty:
+            st.subheader("Reviews Over Time (Past 12 Months)")
+            
+            fig_time = px.line(
+                combined_time_df,
+                x='date',
+                y='count',
+                color='Domain',
+                title="Review Volume Trends",
+                markers=True,
+                template="plotly_white"
+            )
+            fig_time.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+            st.plotly_chart(fig_time, use_container_width=True)
+
+        # 4. Additional Comparisons
+        col3, col4 = st.columns(2)
+        
+        with col3:
+            st.subheader("Reply Rate Comparison")
+            fig_reply = px.bar(
+                metrics_df,
+                x='Domain',
+                y='Reply Rate (%)',
+                color='Domain',
+                title="Negative Review Reply Rate",
+                template="plotly_white"
+            )
+            fig_reply.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+            st.plotly_chart(fig_reply, use_container_width=True)
+        
+        with col4:
+            if not combined_source_df.empty:
+                st.subheader("Review Sources Breakdown")
                 
-                with col4:
-                    if all_source_dists:
-                        st.subheader("Review Sources Breakdown")
-                        combined_source_df = pd.concat(all_source_dists)
-                        
-                        fig_source = px.bar(
-                            combined_source_df,
-                            x='Domain',
-                            y='count',
-                            color='source',
-                            title="Review Sources by Domain",
-                            barmode='stack',
-                            template="plotly_white"
-                        )
-                        fig_source.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
-                        st.plotly_chart(fig_source, use_container_width=True)
-            else:
-                st.error("No data could be fetched for the selected domains.")
+                fig_source = px.bar(
+                    combined_source_df,
+                    x='Domain',
+                    y='count',
+                    color='source',
+                    title="Review Sources by Domain",
+                    barmode='stack',
+                    template="plotly_white"
+                )
+                fig_source.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
+                st.plotly_chart(fig_source, use_container_width=True)
+
+        # 5. Review Volume Anomalies
+        st.subheader("Review Volume Anomalies")
+        anomalies_df = detect_volume_anomalies({d: comparison_results[d]['detailed'] for d in comparison_domains})
+        if anomalies_df.empty:
+            st.info("No unusual review-volume spikes or shifts detected.")
+        else:
+            flagged_domains = anomalies_df['domain'].unique().tolist()
+            st.warning(f"Flagged domains: {', '.join(flagged_domains)}")
+            st.caption("Spikes are months far above the rolling 6-month level; shifts are lasting changes in monthly volume.")
+            st.dataframe(anomalies_df, use_container_width=True)
+
+        # 6. Export
+        st.subheader("Export")
+        export_format = st.selectbox(
+            "Export format:",
+            options=list(EXPORT_FORMATS),
+            format_func={'csv': "CSV", 'jsonl': "JSON Lines", 'parquet': "Parquet"}.get
+        )
+        if st.button("Prepare Export"):
+            # Only the latest export of a session is kept on disk
+            previous_export = st.session_state["comparison_export"]
+            if previous_export:
+                shutil.rmtree(previous_export['directory'], ignore_errors=True)
+
+            # Exports left behind by sessions that have since closed are removed once they are old
+            remove_stale_exports(EXPORT_DIR, 'comparison-', EXPORT_MAX_AGE_SECONDS)
+            os.makedirs(EXPORT_DIR, exist_ok=True)
+            export_dir = tempfile.mkdtemp(prefix='comparison-', dir=EXPORT_DIR)
+            export_progress = st.progress(0)
+            missing_domains = []
+
+            def load_stored_domain(domain):
+                # Exports only read stored snapshots (whatever their age): no live fetches in the script thread
+                snapshot = load_snapshot(get_snapshot_store(), domain)
+                if not snapshot:
+                    missing_domains.append(domain)
+                    return None, None
+                return snapshot['review_data'], snapshot['transparency_data']
+
+            # Domains are written one at a time as they are loaded, so memory use does not grow with the export
+            export_files = export_domains(
+                comparison_domains,
+                load_stored_domain,
+                export_dir,
+                formats=[export_format],
+                progress=lambda done, total, _: export_progress.progress(done / total)
+            )
+            export_progress.empty()
+            st.session_state["comparison_export"] = {
+                'directory': export_dir,
+                'zip_path': zip_export(export_files, os.path.join(export_dir, f"trustpilot-comparison-{export_format}.zip")),
+                'domains': len(comparison_domains) - len(missing_domains),
+                'missing': missing_domains,
+            }
+
+        comparison_export = st.session_state["comparison_export"]
+        if comparison_export and os.path.exists(comparison_export['zip_path']):
+            st.caption(f"Export of {comparison_export['domains']} domains ready.")
+            if comparison_export.get('missing'):
+                st.warning(f"No stored data for {', '.join(comparison_export['missing'])}; not exported.")
+            with open(comparison_export['zip_path'], 'rb') as export_file:
+                st.download_button(
+                    "Download Export",
+                    data=export_file,
+                    file_name=os.path.basename(comparison_export['zip_path']),
+                    mime="application/zip"
+                )
+
+# --- TAB 3: Review Search ---
+with tab3:
+    st.markdown("<h2 style='font-size: 1.8rem;'>Search Review Texts</h2>", unsafe_allow_html=True)
+
+    search_index = get_search_index()
+    search_query = st.text_input("Keywords (e.g. delivery refund):")
+    exact_phrase = st.checkbox("Match exact phrase", value=False)
+
+    col_s1, col_s2 = st.columns(2)
+    with col_s1:
+        search_domains = st.multiselect("Domains:", options=indexed_domains(search_index))
+    with col_s2:
+        search_ratings = st.multiselect("Star ratings:", options=[1, 2, 3, 4, 5])
+
+    col_s3, col_s4 = st.columns(2)
+    with col_s3:
+        search_since = st.date_input("Published from:", value=None)
+    with col_s4:
+        search_until = st.date_input("Published until:", value=None)
+
+    if search_query:
+        results_df = search_reviews(
+            search_index,
+            search_query,
+            phrase=exact_phrase,
+            domains=search_domains,
+            ratings=search_ratings,
+            since=search_since,
+            # 'until' is exclusive, so pass the following midnight to include the whole selected day
+            until=pd.Timestamp(search_until) + pd.Timedelta(days=1) if search_until else None,
+            limit=200
+        )
+        if results_df.empty:
+            st.info("No indexed reviews match this search.")
+        else:
+            st.caption(f"Showing {len(results_df)} best matches.")
+            st.dataframe(results_df, use_container_width=True)
+    else:
+        st.caption("Reviews are indexed as domains are analyzed or compared.")
@@ -0,0 +1,147 @@
+import os
+import glob
+import struct
+import threading
+import time
+
+import pandas as pd
+import zstandard
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; the in-process lock still applies there.
+    fcntl = None
+
+DATA_FILE = 'payloads.zst'
+INDEX_FILE = 'payloads.idx'
+DICT_DIR = 'dictionaries'
+
+# Index record: offset (u64), compressed length (u32), fetch time (f64), URL length (u16), then the URL bytes.
+INDEX_RECORD = struct.Struct('<QIdH')
+COMPRESSION_LEVEL = 12
+DICTIONARY_SIZE = 112640
+
+_write_lock = threading.Lock()
+_dictionaries = {}
+
+def _current_dictionary(archive_dir):
+    """Returns the most recently trained dictionary for the archive, or None."""
+    paths = glob.glob(os.path.join(archive_dir, DICT_DIR, '*.zdict'))
+    if not paths:
+        return None
+    return _load_dictionary(archive_dir, int(os.path.basename(max(paths, key=os.path.getmtime))[:-6]))
+
+def _load_dictionary(archive_dir, dict_id):
+    """Loads (and caches) the dictionary with the given ID."""
+    key = (os.path.abspath(archive_dir), dict_id)
+    if key not in _dictionaries:
+        with open(os.path.join(archive_dir, DICT_DIR, f'{dict_id}.zdict'), 'rb') as f:
+            _dictionaries[key] = zstandard.ZstdCompressionDict(f.read())
+    return _dictionaries[key]
+
+def archive_payload(archive_dir, url, raw_json, fetched_at=None):
+    """
+    Appends one raw __NEXT_DATA__ JSON string to the archive as an independent zstd frame,
+    using the current trained dictionary if there is one.
+    Safe to call from several threads and processes at once.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    dictionary = _current_dictionary(archive_dir)
+    compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=dictionary)
+    frame = compressor.compress(raw_json.encode('utf-8'))
+    url_bytes = url.encode('utf-8')
+    fetched_at = time.time() if fetched_at is None else fetched_at
+
+    with _write_lock, open(os.path.join(archive_dir, INDEX_FILE), 'ab') as index_file:
+        if fcntl:
+            fcntl.flock(index_file, fcntl.LOCK_EX)
+        try:
+            with open(os.path.join(archive_dir, DATA_FILE), 'ab') as data_file:
+                offset = data_file.seek(0, os.SEEK_END)
+                data_file.write(frame)
+            index_file.write(INDEX_RECORD.pack(offset, len(frame), fetched_at, len(url_bytes)) + url_bytes)
+        finally:
+            if fcntl:
+                fcntl.flock(index_file, fcntl.LOCK_UN)
+
+def read_archive_index(archive_dir):
+    """
+    Reads the offset index of an archive.
+    Returns a DataFrame with columns: offset, length, fetched_at, url (in archive order).
+    """
+    path = os.path.join(archive_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=['offset', 'length', 'fetched_at', 'url'])
+
+    with open(path, 'rb') as f:
+        buffer = f.read()
+
+    records = []
+    position = 0
+    while position + INDEX_RECORD.size <= len(buffer):
+        offset, length, fetched_at, url_length = INDEX_RECORD.unpack_from(buffer, position)
+        position += INDEX_RECORD.size
+        if position + url_length > len(buffer):
+            break  # Truncated trailing record from an interrupted write
+        records.append((offset, length, fetched_at, buffer[position:position + url_length].decode('utf-8')))
+        position += url_length
+
+    df = pd.DataFrame(records, columns=['offset', 'length', 'fetched_at', 'url'])
+    df['fetched_at'] = pd.to_datetime(df['fetched_at'], unit='s', utc=True)
+    return df
+
+def read_payloads(archive_dir, spans):
+    """
+    Yields the raw JSON strings for the given (offset, length) spans.
+    Spans are read in order through a single file handle, so sorted spans read sequentially.
+    """
+    decompressors = {}
+    with open(os.path.join(archive_dir, DATA_FILE), 'rb') as f:
+        for offset, length in spans:
+            f.seek(offset)
+            frame = f.read(length)
+            dict_id = zstandard.get_frame_parameters(frame).dict_id
+            if dict_id not in decompressors:
+                dictionary = _load_dictionary(archive_dir, dict_id) if dict_id else None
+                decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+            yield decompressors[dict_id].decompress(frame).decode('utf-8')
+
+def train_archive_dictionary(archive_dir, max_samples=2000, dict_size=DICTIONARY_SIZE):
+    """
+    Trains a zstd dictionary on the most recent archived payloads and makes it the
+    dictionary for new writes. Earlier frames stay readable, as every frame records
+    the ID of the dictionary it was compressed with. Returns the new dictionary ID.
+    """
+    index = read_archive_index(archive_dir).tail(max_samples)
+    if index.empty:
+        raise ValueError(f"No archived payloads to train on in {archive_dir!r}.")
+
+    samples = [
+        payload.encode('utf-8')
+        for payload in read_payloads(archive_dir, zip(index['offset'], index['length']))
+    ]
+    dictionary = zstandard.train_dictionary(dict_size, samples)
+
+    os.makedirs(os.path.join(archive_dir, DICT_DIR), exist_ok=True)
+    path = os.path.join(archive_dir, DICT_DIR, f'{dictionary.dict_id()}.zdict')
+    with open(path, 'wb') as f:
+        f.write(dictionary.as_bytes())
+    return dictionary.dict_id()
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    from config import ARCHIVE_DIR
+
+    parser = argparse.ArgumentParser(description="Inspect the raw payload archive or train its compression dictionary.")
+    parser.add_argument('--archive', default=ARCHIVE_DIR, help="Archive directory (default: %(default)s)")
+    parser.add_argument('--train', action='store_true', help="Train a new dictionary from recent payloads")
+    args = parser.parse_args()
+
+    if args.train:
+        print(f"Trained dictionary {train_archive_dictionary(args.archive)}.")
+
+    index = read_archive_index(args.archive)
+    print(f"{len(index)} payloads, {index['length'].sum() / 1e6:.1f} MB compressed.")
@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    rowid INTEGER PRIMARY KEY,
+    review_id TEXT NOT NULL UNIQUE,
+    domain TEXT NOT NULL,
+    rating INTEGER,
+    language TEXT,
+    published_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_domain_published ON reviews(domain, published_at);
+CREATE INDEX IF NOT EXISTS idx_reviews_published ON reviews(published_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS review_text USING fts5(
+    title,
+    text,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+RESULT_COLUMNS = ['review_id', 'domain', 'rating', 'language', 'title', 'snippet', 'published']
+
+# A transaction belongs to the connection, not the thread: writers sharing a connection
+# (e.g. Streamlit sessions) must not interleave their transactions
+WRITE_LOCK = threading.Lock()
+
+def open_search_index(path):
+    """
+    Opens (and creates if needed) the SQLite FTS5 review search index at 'path'.
+    The connection may be shared between threads, e.g. by Streamlit's resource cache;
+    index_reviews serializes its transactions with WRITE_LOCK.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def parse_review_timestamp(value):
+    """Converts a Trustpilot ISO date string (e.g. '2025-03-01T10:00:00.000Z') to epoch seconds."""
+    if not value:
+        return None
+    try:
+        return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+    except (ValueError, AttributeError):
+        return None
+
+def index_reviews(conn, domain, reviews):
+    """
+    Adds or updates the given reviews (as returned by extract_reviews) in the index.
+    Reviews are keyed by their Trustpilot ID, so re-indexing the same page is a no-op
+    apart from picking up edited texts. Returns the number of reviews written.
+    """
+    written = 0
+    with WRITE_LOCK, conn:
+        for review in reviews or []:
+            if not isinstance(review, dict) or not review.get('id'):
+                continue
+            dates = review.get('dates') or {}
+            row = (
+                domain,
+                review.get('rating'),
+                review.get('language'),
+                parse_review_timestamp(dates.get('publishedDate')),
+                review['id'],
+            )
+            existing = conn.execute(
+                "SELECT rowid FROM reviews WHERE review_id = ?", (review['id'],)
+            ).fetchone()
+            if existing:
+                rowid = existing[0]
+                conn.execute(
+                    "UPDATE reviews SET domain = ?, rating = ?, language = ?, published_at = ? "
+                    "WHERE review_id = ?",
+                    row,
+                )
+                conn.execute("DELETE FROM review_text WHERE rowid = ?", (rowid,))
+            else:
+                rowid = conn.execute(
+                    "INSERT INTO reviews (domain, rating, language, published_at, review_id) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    row,
+                ).lastrowid
+            conn.execute(
+                "INSERT INTO review_text (rowid, title, text) VALUES (?, ?, ?)",
+                (rowid, review.get('title') or '', review.get('text') or ''),
+            )
+            written += 1
+    return written
+
+def build_match_query(query, phrase=False):
+    """
+    Turns user input into a safe FTS5 MATCH expression.
+    Keywords are ANDed together; with phrase=True the whole input must appear in order.
+    """
+    terms = [term.replace('"', '') for term in query.split()]
+    terms = [term for term in terms if term]
+    if not terms:
+        return None
+    if phrase:
+        return '"' + ' '.join(terms) + '"'
+    return ' '.join(f'"{term}"' for term in terms)
+
+def search_reviews(conn, query, phrase=False, domains=None, ratings=None, since=None, until=None, limit=50):
+    """
+    Searches review titles and texts, best matches first.
+    Optional filters: a list of domains, a list of star ratings and a publication
+    window from 'since' (inclusive) to 'until' (exclusive), as datetimes or anything
+    pd.Timestamp accepts. Returns a DataFrame with the columns in RESULT_COLUMNS.
+    """
+    match = build_match_query(query, phrase=phrase)
+    if not match:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    sql = (
+        "SELECT r.review_id, r.domain, r.rating, r.language, r.published_at, t.title, "
+        "snippet(review_text, 1, '**', '**', '…', 16) "
+        "FROM review_text t JOIN reviews r ON r.rowid = t.rowid "
+        "WHERE review_text MATCH ?"
+    )
+    params = [match]
+    if domains:
+        sql += f" AND r.domain IN ({', '.join('?' * len(domains))})"
+        params.extend(domains)
+    if ratings:
+        sql += f" AND r.rating IN ({', '.join('?' * len(ratings))})"
+        params.extend(int(rating) for rating in ratings)
+    if since is not None:
+        sql += " AND r.published_at >= ?"
+        params.append(int(pd.Timestamp(since).timestamp()))
+    if until is not None:
+        sql += " AND r.published_at < ?"
+        params.append(int(pd.Timestamp(until).timestamp()))
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(int(limit))
+
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    df = pd.DataFrame(
+        rows,
+        columns=['review_id', 'domain', 'rating', 'language', 'published_at', 'title', 'snippet'],
+    )
+    df['published'] = pd.to_datetime(df['published_at'], unit='s', utc=True)
+    return df[RESULT_COLUMNS]
+
+def indexed_domains(conn):
+    """Returns the sorted list of domains that have at least one indexed review."""
+    return [row[0] for row in conn.execute("SELECT DISTINCT domain FROM reviews ORDER BY domain")]
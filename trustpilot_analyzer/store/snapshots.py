@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    domain TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    review_data BLOB NOT NULL,
+    transparency_data BLOB NOT NULL,
+    summary TEXT NOT NULL,
+    etag TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS domain_views (
+    domain TEXT PRIMARY KEY,
+    views REAL NOT NULL,
+    last_viewed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracked_domains (
+    domain TEXT PRIMARY KEY,
+    added_at REAL NOT NULL
+);
+"""
+
+# Recorded dashboard views decay by half over this period
+VIEW_HALF_LIFE_SECONDS = 24 * 60 * 60
+
+# A transaction belongs to the connection, not the thread: writers sharing a connection
+# (e.g. Streamlit sessions) must not interleave their transactions, and record_view's
+# read-modify-write must not lose updates
+WRITE_LOCK = threading.Lock()
+
+def open_snapshot_store(path):
+    """
+    Opens (and creates if needed) the per-domain snapshot store at 'path': the latest
+    review and transparency payloads of each domain plus their precomputed summary,
+    as well as dashboard views and user-added domains for the refresher.
+    The connection may be shared between threads; writes are serialized with WRITE_LOCK.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _pack(data):
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+def save_snapshot(conn, domain, review_data, transparency_data, summary, fetched_at=None):
+    """
+    Stores the latest payloads and summary for 'domain', replacing the previous snapshot.
+    The summary is serialized once here; its ETag is a hash of that serialization.
+    Returns (summary_json, etag).
+    """
+    summary_json = json.dumps(summary, separators=(',', ':'), sort_keys=True, default=str)
+    etag = '"' + hashlib.blake2b(summary_json.encode('utf-8'), digest_size=12).hexdigest() + '"'
+    with WRITE_LOCK, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO snapshots (domain, fetched_at, review_data, transparency_data, summary, etag) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (domain, fetched_at or time.time(), _pack(review_data), _pack(transparency_data), summary_json, etag)
+        )
+    return summary_json, etag
+
+def load_snapshot(conn, domain):
+    """Returns {'review_data', 'transparency_data', 'fetched_at'} for 'domain', or None."""
+    row = conn.execute(
+        "SELECT review_data, transparency_data, fetched_at FROM snapshots WHERE domain = ?", (domain,)
+    ).fetchone()
+    if not row:
+        return None
+    return {'review_data': _unpack(row[0]), 'transparency_data': _unpack(row[1]), 'fetched_at': row[2]}
+
+def load_summary(conn, domain):
+    """Returns (summary_json, etag, fetched_at) for 'domain' without unpacking the payloads, or None."""
+    return conn.execute(
+        "SELECT summary, etag, fetched_at FROM snapshots WHERE domain = ?", (domain,)
+    ).fetchone()
+
+def snapshot_ages(conn):
+    """Returns {domain: fetched_at} for every stored snapshot."""
+    return dict(conn.execute("SELECT domain, fetched_at FROM snapshots"))
+
+def list_snapshots(conn):
+    """Returns {domain: (fetched_at, summary_json)} for every stored snapshot."""
+    return {domain: (fetched_at, summary) for domain, fetched_at, summary in
+            conn.execute("SELECT domain, fetched_at, summary FROM snapshots")}
+
+def _decayed(views, last_viewed, now):
+    return views * 0.5 ** (max(now - last_viewed, 0) / VIEW_HALF_LIFE_SECONDS)
+
+def record_view(conn, domain, viewed_at=None):
+    """Counts one dashboard view of 'domain'. Older views decay with VIEW_HALF_LIFE_SECONDS."""
+    viewed_at = viewed_at or time.time()
+    with WRITE_LOCK, conn:
+        row = conn.execute("SELECT views, last_viewed FROM domain_views WHERE domain = ?", (domain,)).fetchone()
+        views = _decayed(row[0], row[1], viewed_at) + 1 if row else 1.0
+        conn.execute(
+            "INSERT OR REPLACE INTO domain_views (domain, views, last_viewed) VALUES (?, ?, ?)",
+            (domain, views, max(viewed_at, row[1]) if row else viewed_at)
+        )
+
+def view_counts(conn, now=None):
+    """Returns {domain: recent views}, decayed to 'now'."""
+    now = now or time.time()
+    rows = conn.execute("SELECT domain, views, last_viewed FROM domain_views")
+    return {domain: _decayed(views, last_viewed, now) for domain, views, last_viewed in rows}
+
+def track_domain(conn, domain):
+    """Adds a user-entered domain to the set the refresher keeps warm."""
+    with WRITE_LOCK, conn:
+        conn.execute("INSERT OR IGNORE INTO tracked_domains (domain, added_at) VALUES (?, ?)", (domain, time.time()))
+
+def tracked_domains(conn):
+    """Returns the user-added domains, oldest first."""
+    return [row[0] for row in conn.execute("SELECT domain FROM tracked_domains ORDER BY added_at")]
@@ -0,0 +1,101 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+# Add parent directory to path to allow imports from root
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from harvester.egress import build_egress_pool
+from harvester.harvester import fetch_next_data
+
+PAGE = '<html><script id="__NEXT_DATA__" type="application/json">{"props": {"pageProps": {}}}</script></html>'
+
+def start_proxy(status=200):
+    """
+    Starts a stand-in forward proxy on localhost that answers every request itself with
+    'status' (and a page containing __NEXT_DATA__). Returns (server, proxy_url, seen_urls).
+    """
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen.append(self.path)  # Absolute URL, as sent to a proxy
+            body = PAGE.encode('utf-8') if status == 200 else b'slow down'
+            self.send_response(status)
+            if status == 429:
+                self.send_header('Retry-After', '60')
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", seen
+
+@pytest.fixture
+def proxies():
+    servers = []
+
+    def factory(status=200):
+        server, url, seen = start_proxy(status)
+        servers.append(server)
+        return url, seen
+
+    yield factory
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_requests_go_through_the_route_proxy(proxies):
+    proxy_url, seen = proxies()
+    with build_egress_pool([{'name': 'local', 'proxy': proxy_url, 'requests_per_second': 100}]) as pool:
+        data = fetch_next_data('http://trustpilot.test/review/example.com', client=pool)
+
+    assert data == {'props': {'pageProps': {}}}
+    assert seen == ['http://trustpilot.test/review/example.com']
+
+def test_throttled_route_cools_down_and_traffic_moves_to_healthy_route(proxies):
+    throttled_url, throttled_seen = proxies(status=429)
+    healthy_url, healthy_seen = proxies()
+    routes = [
+        {'name': 'throttled', 'proxy': throttled_url, 'requests_per_second': 100},
+        {'name': 'healthy', 'proxy': healthy_url, 'requests_per_second': 100},
+    ]
+    with build_egress_pool(routes) as pool:
+        results = [fetch_next_data(f'http://trustpilot.test/review/example.com?page={page}', client=pool)
+                   for page in range(1, 7)]
+        stats = pool.stats().set_index('route')
+
+    # With equal costs the first route is tried first; after its 429 it cools down for Retry-After
+    assert len(throttled_seen) == 1
+    assert len(healthy_seen) == 5
+    assert sum(result is not None for result in results) == 5
+    assert stats.loc['throttled', 'cooldown_s'] >= 59
+
+def test_max_wait_fails_fast_when_every_route_is_cooling_down(proxies):
+    throttled_url, _ = proxies(status=429)
+    with build_egress_pool([{'name': 'throttled', 'proxy': throttled_url, 'requests_per_second': 100}],
+                           max_wait=1.0) as pool:
+        assert fetch_next_data('http://trustpilot.test/review/example.com', client=pool) is None
+
+        start = time.monotonic()
+        with pytest.raises(httpx.RequestError):
+            pool.get('http://trustpilot.test/review/example.com')
+        assert fetch_next_data('http://trustpilot.test/review/example.com', client=pool) is None
+        assert time.monotonic() - start < 1.0
+
+def test_route_is_released_when_the_request_raises(proxies):
+    proxy_url, _ = proxies()
+    with build_egress_pool([{'name': 'local', 'proxy': proxy_url, 'requests_per_second': 100}]) as pool:
+        with pytest.raises(httpx.InvalidURL):
+            pool.get('http://trustpilot.test/review/\x00')
+        assert pool.stats().loc[0, 'in_flight'] == 0